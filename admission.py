@@ -0,0 +1,134 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Rejected(Exception):
+    """A request turned away by ``AdmissionController``; answer it with ``status`` and ``Retry-After``."""
+
+    def __init__(self, reason, status, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.status = status
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounded work queue in front of the generation endpoint.
+
+    At most ``process_limit`` generations run at once, and at most
+    ``mood_limit`` of those for any one mood. Up to ``queue_size`` more wait
+    their turn in arrival order. A request that finds the queue full is
+    rejected straight away (429), and one still waiting when its deadline
+    comes is dropped (503), so an overload costs callers a fast retry
+    instead of seconds of queueing.
+    """
+
+    def __init__(self, process_limit=4, mood_limit=2, queue_size=32):
+        self.process_limit = process_limit
+        self.mood_limit = mood_limit
+        self.queue_size = queue_size
+        self.running = 0
+        self.running_by_mood = {}
+        self.waiting_by_mood = {}
+        self._queue = []
+        self._cond = threading.Condition()
+        # Exponential moving average of how long an admitted request holds its slot.
+        self._service_time = 0.05
+
+    @property
+    def waiting(self):
+        return len(self._queue)
+
+    def _can_run(self, mood):
+        return self.running < self.process_limit and self.running_by_mood.get(mood, 0) < self.mood_limit
+
+    def _next_runnable(self):
+        """The oldest waiter that could start now; a waiter for a busy mood does not block the others."""
+        for ticket in self._queue:
+            if self._can_run(ticket[0]):
+                return ticket
+        return None
+
+    def _backlog(self):
+        """Seconds until a slot is likely free, from the queue length and recent service times."""
+        return (self.waiting + 1) * self._service_time / max(self.process_limit, 1)
+
+    def expected_wait(self, mood):
+        """Seconds a new request for ``mood`` would likely spend queued (0 if it can start now)."""
+        if not self._queue and self._can_run(mood):
+            return 0.0
+        return self._backlog()
+
+    def retry_after(self):
+        return max(1, math.ceil(self._backlog()))
+
+    @contextmanager
+    def admit(self, mood, deadline):
+        """
+        Hold a slot for ``mood`` while the block runs. Waits at most until
+        ``deadline`` (a ``time.perf_counter()`` value); raises ``Rejected``.
+        """
+        with self._cond:
+            if self._queue or not self._can_run(mood):
+                if len(self._queue) >= self.queue_size:
+                    raise Rejected("queue_full", 429, self.retry_after())
+                ticket = (mood, object())
+                self._queue.append(ticket)
+                self.waiting_by_mood[mood] = self.waiting_by_mood.get(mood, 0) + 1
+                try:
+                    while self._next_runnable() is not ticket:
+                        remaining = deadline - time.perf_counter()
+                        if remaining <= 0:
+                            raise Rejected("deadline_in_queue", 503, self.retry_after())
+                        self._cond.wait(remaining)
+                finally:
+                    self._queue.remove(ticket)
+                    self.waiting_by_mood[mood] -= 1
+                    # Whoever is now first in line may be able to run.
+                    self._cond.notify_all()
+            self._start(mood)
+        yield from self._hold(mood)
+
+    @contextmanager
+    def admit_if_idle(self, mood):
+        """
+        Hold a slot for ``mood`` only if one is free right now and nobody is
+        queued, for background work that must never delay a request; raises
+        ``Rejected("busy", ...)`` otherwise instead of waiting.
+        """
+        with self._cond:
+            if self._queue or not self._can_run(mood):
+                raise Rejected("busy", 503, self.retry_after())
+            self._start(mood)
+        yield from self._hold(mood)
+
+    def _start(self, mood):
+        self.running += 1
+        self.running_by_mood[mood] = self.running_by_mood.get(mood, 0) + 1
+
+    def _hold(self, mood):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.running -= 1
+                self.running_by_mood[mood] -= 1
+                self._service_time += 0.2 * (time.perf_counter() - started - self._service_time)
+                self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "running": self.running,
+                "waiting": self.waiting,
+                "running_by_mood": dict(self.running_by_mood),
+                "waiting_by_mood": dict(self.waiting_by_mood),
+                "process_limit": self.process_limit,
+                "mood_limit": self.mood_limit,
+                "queue_size": self.queue_size,
+                "service_time_s": round(self._service_time, 4),
+            }
@@ -1,140 +1,732 @@
+import time
+STARTUP_STARTED = time.perf_counter()
+
 import os
+import functools
 import json
+import hashlib
+import hmac
+import logging
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
 import numpy as np
 from flask import Flask, jsonify, request, send_file
 from flask_cors import CORS
 from tensorflow.keras.models import load_model
-from midiutil import MIDIFile
-import sqlite3
-
-def init_db():
-    conn = sqlite3.connect('predictions.db')
-    cursor = conn.cursor()
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS predictions (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        mood TEXT NOT NULL,
-        input_sequence TEXT NOT NULL,
-        generated_progression TEXT NOT NULL,
-        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
-    conn.commit()
-    conn.close()
+from generate_midi import chord_to_notes, render_midi
+from predictions_db import fetch_predictions, init_db, insert_prediction
+from inference_backends import make_backend
+from engines import (KerasEngine, MultiStepEngine, NGramEngine, StreamEngine, StudentEngine, TableEngine, TimedEngine,
+                     generate, generate_multistep, generate_speculative, generate_stream)
+from ngram_model import NGramModel, ngram_path
+from student_model import StudentModel, student_path
+from stream_model import StreamModel, stream_path
+from metrics import Registry, instrument_app
+from profiling import install_profiler
+from traffic_capture import install_capture
+from memory_introspection import SnapshotDiffer, cache_tier_bytes, engine_bytes, rss_mb
+from admission import AdmissionController, Rejected
+from engine_router import EngineRouter
+from experiments import EngineStats, ShadowEvaluator, assign_arm, parse_split
+from result_cache import SingleFlight, cache_key, decode_result, encode_result, get_or_compute, make_cache
+from structured_logging import install_request_ids, log_queue, setup_logging
+from tracing import install_tracing, make_tracer
+
+IMPORTS_FINISHED = time.perf_counter()
+
+setup_logging()
+logger = logging.getLogger(__name__)
 
 init_db()
 
 app = Flask(__name__)
 CORS(app)
+install_request_ids(app)
+
+registry = Registry()
+instrument_app(app, registry, "chord_app")
+stage_seconds = registry.histogram(
+    "chord_stage_seconds", "Time spent in each stage of serving a request, in seconds.", ("stage", "mood", "engine"))
+progressions_total = registry.counter(
+    "chord_progressions_total", "Progressions served, by where the result came from.", ("mood", "engine", "cache"))
+rejections_total = registry.counter(
+    "chord_rejections_total", "Generation requests shed by admission control.", ("mood", "reason"))
+truncated_total = registry.counter(
+    "chord_truncated_total", "Progressions cut short by their deadline.", ("mood", "engine"))
+fallbacks_total = registry.counter(
+    "chord_engine_fallbacks_total", "Requests moved to a cheaper engine to meet the latency SLO.",
+    ("mood", "requested", "served"))
+ab_assignments_total = registry.counter(
+    "chord_ab_assignments_total", "Requests without an engine assigned one by the A/B split.", ("mood", "engine"))
 
 os.makedirs("mappings", exist_ok=True)
 os.makedirs("models", exist_ok=True)
 
 moods = ["happy", "sad", "calm", "excited", "melancholic"]
-models = {}
-mappings = {}
+MAX_DRAFT_LENGTH = 16
+# "auto" uses the pick saved by `python inference_backends.py`.
+INFERENCE_BACKEND = os.environ.get("CHORD_INFERENCE_BACKEND", "auto")
+LOADER_THREADS = int(os.environ.get("CHORD_LOADER_THREADS", "8"))
+STARTUP_TIMELINE_PATH = "models/startup_timeline.json"
+# Endpoints that need the models and answer 503 until they are warm.
+MODEL_ENDPOINTS = {"generate_progression"}
+ENGINE_KINDS = ("keras", "multistep", "ngram", "student", "stream", "table")
+# The "table" engine precomputes the Keras model's pick for every context; skipped above this many.
+TABLE_MAX_CONTEXTS = 200_000
+RELOAD_INTERVAL = float(os.environ.get("CHORD_RELOAD_INTERVAL", "0"))
+# /admin/* endpoints (and X-Profile) need this token in X-Admin-Token; they are refused while it is unset.
+ADMIN_TOKEN = os.environ.get("CHORD_ADMIN_TOKEN")
+RESULT_CACHE_SIZE = int(os.environ.get("CHORD_CACHE_SIZE", "1024"))
+RESULT_CACHE_TTL = float(os.environ.get("CHORD_CACHE_TTL", "300"))
+# Comma-separated, fastest first: memory (this process), disk (SQLite shared
+# by the workers on this host) and redis (shared by every host).
+RESULT_CACHE_TIERS = os.environ.get("CHORD_CACHE_TIERS", "memory").split(",")
+RESULT_CACHE_DB = os.environ.get("CHORD_CACHE_DB", "cache/results.sqlite")
+REDIS_URL = os.environ.get("CHORD_REDIS_URL", "redis://localhost:6379/0")
+# Admission control for /generate-progression; see admission.AdmissionController.
+MAX_STEPS = int(os.environ.get("CHORD_MAX_STEPS", "256"))
+DEADLINE_MS = float(os.environ.get("CHORD_DEADLINE_MS", "2000"))
+CONCURRENCY_LIMIT = int(os.environ.get("CHORD_CONCURRENCY", "4"))
+MOOD_CONCURRENCY_LIMIT = int(os.environ.get("CHORD_MOOD_CONCURRENCY", "2"))
+QUEUE_SIZE = int(os.environ.get("CHORD_QUEUE_SIZE", "32"))
+# Greedy requests expected to take longer than this move to a cheaper engine (unless "fallback": false).
+LATENCY_SLO_MS = float(os.environ.get("CHORD_LATENCY_SLO_MS", "1000"))
+ENGINE_FALLBACKS = {
+    "keras": ("table", "ngram"),
+    "multistep": ("table", "ngram"),
+    "student": ("table", "ngram"),
+    "stream": ("table", "ngram"),
+}
+# Lookups finish in microseconds; queueing them behind model calls would only add latency.
+UNQUEUED_ENGINES = {"table", "ngram"}
+# A/B split for requests that do not name an engine, e.g. "keras=90,student=10". With CHORD_AB_KEY=client
+# each client (X-Client-Id, else its address) always lands on the same engine; "random" draws per request.
+AB_SPLIT = parse_split(os.environ.get("CHORD_AB_SPLIT", ""))
+AB_KEY = os.environ.get("CHORD_AB_KEY", "client")
+CLIENT_ID_HEADER = "X-Client-Id"
+# Engines rerun in the background on served requests and compared with the primary, e.g. "table,ngram".
+SHADOW_ENGINES = [name for name in os.environ.get("CHORD_SHADOW_ENGINES", "").split(",") if name]
+SHADOW_SAMPLE_RATE = float(os.environ.get("CHORD_SHADOW_SAMPLE_RATE", "1"))
+SHADOW_WORKERS = int(os.environ.get("CHORD_SHADOW_WORKERS", "1"))
+for name in [arm for arm, _ in AB_SPLIT] + SHADOW_ENGINES:
+    if name not in ENGINE_KINDS:
+        raise ValueError(f"Unknown engine '{name}' in CHORD_AB_SPLIT or CHORD_SHADOW_ENGINES")
+# Profiling is off unless one of these is set; see profiling.install_profiler.
+PROFILE_HEADER_ENABLED = os.environ.get("CHORD_PROFILE_HEADER", "0") == "1"
+PROFILE_SAMPLE_RATE = float(os.environ.get("CHORD_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.environ.get("CHORD_PROFILE_DIR", "profiles")
+PROFILE_MAX = int(os.environ.get("CHORD_PROFILE_MAX", "100"))
+install_profiler(app, PROFILE_DIR, PROFILE_SAMPLE_RATE, PROFILE_HEADER_ENABLED, PROFILE_MAX, ADMIN_TOKEN)
+# Set to e.g. captures/traffic.jsonl to record requests for `load_test.py --capture`.
+CAPTURE_PATH = os.environ.get("CHORD_CAPTURE_PATH")
+if CAPTURE_PATH:
+    install_capture(app, CAPTURE_PATH, float(os.environ.get("CHORD_CAPTURE_RATE", "1")))
+# Set to e.g. traces/spans.jsonl to record spans for `trace_viewer.py`; dash_app.py reads the same variables.
+TRACE_PATH = os.environ.get("CHORD_TRACE_PATH")
+TRACE_SAMPLE_RATE = float(os.environ.get("CHORD_TRACE_SAMPLE_RATE", "1"))
+tracer = make_tracer("chord_app", TRACE_PATH, TRACE_SAMPLE_RATE)
+install_tracing(app, tracer)
+# Stack depth recorded by tracemalloc once /admin/memory/snapshot turns it on.
+TRACEMALLOC_FRAMES = int(os.environ.get("CHORD_TRACEMALLOC_FRAMES", "1"))
+
+# mood -> {"version", "signature", "mapping", "engines"}. A bundle is never
+# mutated once published; a reload swaps in a new one with one assignment,
+# so a request that looked its bundle up keeps that version to the end.
+artifacts = {}
+
+startup_timeline = []
+startup_lock = threading.Lock()
+models_ready = threading.Event()
+reload_lock = threading.Lock()
+
+# Decoding is deterministic, so results are shared between identical requests:
+# concurrent ones through ``in_flight``, later ones through ``result_cache``.
+# Keys include the model version, so a reload never serves stale results.
+result_cache = make_cache(RESULT_CACHE_TIERS, RESULT_CACHE_TTL, RESULT_CACHE_SIZE, RESULT_CACHE_DB, REDIS_URL)
+in_flight = SingleFlight()
+# Guards each mood's progression file; rendering and cache lookups happen outside it.
+midi_locks = {mood: threading.Lock() for mood in moods}
+last_midi = {}
+memory_snapshots = SnapshotDiffer(TRACEMALLOC_FRAMES)
+admission = AdmissionController(CONCURRENCY_LIMIT, MOOD_CONCURRENCY_LIMIT, QUEUE_SIZE)
+router = EngineRouter(LATENCY_SLO_MS / 1000, ENGINE_FALLBACKS, UNQUEUED_ENGINES)
+registry.gauge("chord_engine_step_seconds", "Recent average seconds per generated chord, as the router sees it.",
+               ("engine",), lambda: {(engine,): seconds for engine, seconds in router.stats().items()})
+engine_stats = EngineStats()
+shadow = ShadowEvaluator(SHADOW_ENGINES, engine_stats, SHADOW_SAMPLE_RATE, SHADOW_WORKERS,
+                         admission=admission, unqueued=UNQUEUED_ENGINES)
+registry.gauge("chord_shadow_agreement", "Share of chords on which a shadow engine matched the primary.",
+               ("comparison",), lambda: {(comparison,): row["position_agreement"]
+                                         for comparison, row in engine_stats.report()["agreement"].items()})
+registry.gauge("chord_queue_waiting", "Generation requests waiting for a slot.", ("mood",),
+               lambda: {(mood,): count for mood, count in admission.stats()["waiting_by_mood"].items()})
+registry.gauge("chord_generations_running", "Generations holding a slot.", ("mood",),
+               lambda: {(mood,): count for mood, count in admission.stats()["running_by_mood"].items()})
+
+
+@contextmanager
+def traced_stage(stage, mood, engine):
+    """Time a request stage in ``stage_seconds`` and record it as a span; yields the span (or None)."""
+    with tracer.span(stage, mood=mood, engine=engine) as span:
+        with stage_seconds.time(stage=stage, mood=mood, engine=engine):
+            yield span
+
+
+@contextmanager
+def timed_phase(phase, mood=None):
+    """Record how long a loading phase took."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(phase, started, time.perf_counter(), mood)
+
+
+def record_phase(phase, started, finished, mood=None):
+    entry = {
+        "phase": phase,
+        "mood": mood,
+        "start_s": round(started - STARTUP_STARTED, 4),
+        "duration_s": round(finished - started, 4),
+        "thread": threading.current_thread().name,
+    }
+    # Only the initial load belongs to the startup timeline; reloads are just logged.
+    event = "reload_phase" if models_ready.is_set() else "startup_phase"
+    if event == "startup_phase":
+        with startup_lock:
+            startup_timeline.append(entry)
+    logger.info("%s %s", event, phase, extra={"event": event, "timing": entry})
+
+
+def artifact_paths(mood):
+    return [f"models/{mood}_chord_model.h5", f"models/{mood}_multistep_model.h5",
+            f"mappings/{mood}_mappings.json", ngram_path(mood), student_path(mood), stream_path(mood)]
+
+
+def artifact_signature(mood):
+    """Cheap change detector: (path, mtime, size) of every artifact that exists."""
+    signature = []
+    for path in artifact_paths(mood):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        signature.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def artifact_version(mood):
+    """Short content hash over the mood's artifacts, returned to clients as ``model_version``."""
+    digest = hashlib.sha1()
+    for path in artifact_paths(mood):
+        if os.path.exists(path):
+            digest.update(path.encode())
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return f"{mood}-{digest.hexdigest()[:12]}"
 
-for mood in moods:
+
+def load_keras_model(mood):
     model_path = f"models/{mood}_chord_model.h5"
-    mapping_path = f"mappings/{mood}_mappings.json"
+    if not os.path.exists(model_path):
+        logger.error("Model file '%s' not found.", model_path)
+        return None
+    try:
+        with timed_phase("load_model", mood):
+            model = load_model(model_path)
+        with timed_phase("warm_up", mood):
+            backend = make_backend(model, INFERENCE_BACKEND)
+        logger.info("Loaded model for '%s' (%s backend)", mood, backend.name)
+        return KerasEngine(model, backend)
+    except Exception as e:
+        logger.error("Error loading model '%s': %s", mood, e)
+        return None
+
+
+def load_multistep_model(mood):
+    multistep_path = f"models/{mood}_multistep_model.h5"
+    if not os.path.exists(multistep_path):
+        return None
+    try:
+        with timed_phase("load_multistep_model", mood):
+            model = load_model(multistep_path)
+        with timed_phase("warm_up_multistep", mood):
+            backend = make_backend(model, INFERENCE_BACKEND)
+        logger.info("Loaded multi-step model for '%s' (%s backend)", mood, backend.name)
+        return MultiStepEngine(model, backend)
+    except Exception as e:
+        logger.error("Error loading multi-step model '%s': %s", mood, e)
+        return None
+
+
+def load_table_engine(kind, mood, path, loader, engine_class, vocabulary):
+    """Load one of the NumPy engines and check it shares the mood's vocabulary."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with timed_phase(f"build_{kind}", mood):
+            loaded = loader(path)
+        if loaded.vocabulary != vocabulary:
+            logger.warning("%s vocabulary for '%s' does not match its mappings, skipping.", kind, mood)
+            return None
+        logger.info("Loaded %s model for '%s'", kind, mood)
+        return engine_class(loaded)
+    except Exception as e:
+        logger.error("Error loading %s model '%s': %s", kind, mood, e)
+        return None
+
 
-    if os.path.exists(model_path):
+def load_mappings_and_tables(mood):
+    """The mood's mappings plus the NumPy engines that must match their vocabulary."""
+    mapping = None
+    mapping_path = f"mappings/{mood}_mappings.json"
+    if os.path.exists(mapping_path):
         try:
-            models[mood] = load_model(model_path)
-            print(f"✅ Loaded model for '{mood}'")
+            with timed_phase("load_mappings", mood):
+                with open(mapping_path, 'r') as f:
+                    mapping = json.load(f)
+            if not mapping:
+                logger.warning("Mappings file for '%s' is empty.", mood)
+            elif "chord_to_index" not in mapping or "index_to_chord" not in mapping:
+                logger.warning("Mappings for '%s' are missing required keys.", mood)
         except Exception as e:
-            print(f"❌ Error loading model '{mood}': {e}")
+            logger.error("Error reading mappings for '%s': %s", mood, e)
     else:
-        print(f"❌ Model file '{model_path}' not found.")
+        logger.error("Mappings file '%s' not found.", mapping_path)
 
-    if os.path.exists(mapping_path):
+    mood_index_to_chord = (mapping or {}).get("index_to_chord", {})
+    mood_vocabulary = [mood_index_to_chord.get(str(i)) for i in range(len(mood_index_to_chord))]
+
+    tables = {
+        "ngram": load_table_engine("ngram", mood, ngram_path(mood), NGramModel.load, NGramEngine, mood_vocabulary),
+        "student": load_table_engine("student", mood, student_path(mood), StudentModel.load, StudentEngine,
+                                     mood_vocabulary),
+        "stream": load_table_engine("stream", mood, stream_path(mood), StreamModel.load, StreamEngine,
+                                    mood_vocabulary),
+    }
+    return mapping, tables
+
+
+MOOD_LOADERS = (load_keras_model, load_multistep_model, load_mappings_and_tables)
+
+
+def submit_mood(mood, pool):
+    """Start loading every artifact of ``mood`` on ``pool``."""
+    return artifact_signature(mood), artifact_version(mood), [pool.submit(loader, mood) for loader in MOOD_LOADERS]
+
+
+def build_lookup_table(mood, keras_engine, mapping):
+    vocab_size = len((mapping or {}).get("index_to_chord", {}))
+    if keras_engine is None or not vocab_size or vocab_size ** 3 > TABLE_MAX_CONTEXTS:
+        return None
+    try:
+        with timed_phase("build_table", mood):
+            return TableEngine.from_engine(keras_engine, vocab_size)
+    except Exception as e:
+        logger.error("Error building lookup table for '%s': %s", mood, e)
+        return None
+
+
+def assemble_bundle(mood, signature, version, futures):
+    keras_engine, multistep_engine, (mapping, tables) = [future.result() for future in futures]
+    mood_engines = {"keras": keras_engine, "multistep": multistep_engine, **tables,
+                    "table": build_lookup_table(mood, keras_engine, mapping)}
+    return {
+        "version": version,
+        "signature": signature,
+        "mapping": mapping,
+        "engines": {kind: engine for kind, engine in mood_engines.items() if engine is not None},
+    }
+
+
+def smoke_test(bundle, previous=None):
+    """
+    Reason ``bundle`` must not be served, or None if it is fine.
+
+    Every engine generates a few chords from the start of the vocabulary and
+    must stay inside ``index_to_chord``. A bundle that lost an engine the
+    previous version had (e.g. a half-written file) is rejected too.
+    """
+    mapping = bundle["mapping"]
+    if not mapping or "chord_to_index" not in mapping or "index_to_chord" not in mapping:
+        return "mappings are missing or incomplete"
+    if previous is not None:
+        missing = set(previous["engines"]) - set(bundle["engines"])
+        if missing:
+            return f"engines failed to load: {sorted(missing)}"
+
+    index_to_chord = {int(k) for k in mapping["index_to_chord"]}
+    seed = sorted(index_to_chord)[:3]
+    for kind, engine in bundle["engines"].items():
         try:
-            with open(mapping_path, 'r') as f:
-                mappings[mood] = json.load(f)
-            if not mappings[mood]:
-                print(f"⚠️ Warning: Mappings file for '{mood}' is empty.")
-            elif "chord_to_index" not in mappings[mood] or "index_to_chord" not in mappings[mood]:
-                print(f"⚠️ Warning: Mappings for '{mood}' are missing required keys.")
+            if kind == "stream":
+                indices, _ = generate_stream(engine, seed, 4)
+            elif hasattr(engine, "predict_block"):
+                indices = generate_multistep(engine, seed, engine.horizon)
+            else:
+                indices = generate(engine, seed, 4)
         except Exception as e:
-            print(f"❌ Error reading mappings for '{mood}': {e}")
-    else:
-        print(f"❌ Mappings file '{mapping_path}' not found.")
+            return f"{kind} smoke inference failed: {e}"
+        if not set(indices) <= index_to_chord:
+            return f"{kind} predicted indices outside the mappings"
+    return None
 
-chord_to_notes = {
-    "C": [60, 64, 67], "Cm": [60, 63, 67], "D": [62, 66, 69], "Dm": [62, 65, 69],
-    "E": [64, 68, 71], "Em": [64, 67, 71], "F": [65, 69, 72], "Fm": [65, 68, 72],
-    "G": [67, 71, 74], "Gm": [67, 70, 74], "A": [69, 73, 76], "Am": [69, 72, 76],
-    "B": [71, 75, 78], "Bm": [71, 74, 78]
-}
+
+def load_everything():
+    """Load and warm up every mood concurrently, then open the ``/ready`` gate."""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=LOADER_THREADS, thread_name_prefix="loader") as pool:
+        pending = {mood: submit_mood(mood, pool) for mood in moods}
+        for mood, (signature, version, futures) in pending.items():
+            try:
+                artifacts[mood] = assemble_bundle(mood, signature, version, futures)
+            except Exception as e:
+                logger.error("Error during startup for '%s': %s", mood, e)
+    record_phase("load_all", started, time.perf_counter())
+
+    total = time.perf_counter() - STARTUP_STARTED
+    try:
+        with open(STARTUP_TIMELINE_PATH, "w") as f:
+            json.dump({"total_s": round(total, 4),
+                       "phases": sorted(startup_timeline, key=lambda e: e["start_s"])}, f, indent=2)
+    except OSError as e:
+        logger.warning("Could not write startup timeline: %s", e)
+    models_ready.set()
+    logger.info("Ready after %.2fs (timeline in '%s')", total, STARTUP_TIMELINE_PATH)
+
+
+def reload_mood(mood):
+    """Load ``mood`` again from disk and swap it in if it passes the smoke test."""
+    with ThreadPoolExecutor(max_workers=len(MOOD_LOADERS), thread_name_prefix="reload") as pool:
+        bundle = assemble_bundle(mood, *submit_mood(mood, pool))
+    previous = artifacts.get(mood)
+    problem = smoke_test(bundle, previous)
+    if problem:
+        logger.error("Not reloading '%s' (%s): %s", mood, bundle["version"], problem)
+        return bundle["signature"], False
+    artifacts[mood] = bundle
+    old_version = previous["version"] if previous else None
+    logger.info("Reloaded '%s': %s -> %s", mood, old_version, bundle["version"])
+    return bundle["signature"], True
+
+
+def reload_moods(reload_targets, only_changed=False):
+    with reload_lock:
+        if only_changed:
+            # Another reload may have picked the files up while we waited for the lock.
+            reload_targets = [mood for mood in reload_targets
+                              if artifact_signature(mood) != artifacts.get(mood, {}).get("signature")]
+        return {mood: reload_mood(mood) for mood in reload_targets}
+
+
+def watch_artifacts():
+    """Poll artifact files and reload moods whose files changed."""
+    rejected = {}
+    while True:
+        time.sleep(RELOAD_INTERVAL)
+        if not models_ready.is_set():
+            continue
+        changed = []
+        for mood in moods:
+            signature = artifact_signature(mood)
+            current = artifacts.get(mood, {}).get("signature")
+            # Don't retry a rejected set of files until they change again.
+            if signature != current and signature != rejected.get(mood):
+                changed.append(mood)
+        for mood, (signature, swapped) in reload_moods(changed, only_changed=True).items():
+            if not swapped:
+                rejected[mood] = signature
+
+
+record_phase("import", STARTUP_STARTED, IMPORTS_FINISHED)
+threading.Thread(target=load_everything, name="startup", daemon=True).start()
+if RELOAD_INTERVAL > 0:
+    threading.Thread(target=watch_artifacts, name="reload-watcher", daemon=True).start()
+
+@app.before_request
+def wait_for_models():
+    if request.endpoint in MODEL_ENDPOINTS and not models_ready.is_set():
+        response = jsonify({"error": "Models are still loading"})
+        response.headers["Retry-After"] = "1"
+        return response, 503
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness probe: 200 once every model is loaded and warmed up, 503 before."""
+    if not models_ready.is_set():
+        return jsonify({"ready": False, "phases_done": len(startup_timeline)}), 503
+    return jsonify({
+        "ready": True,
+        "engines": {kind: sorted(mood for mood, bundle in artifacts.items() if kind in bundle["engines"])
+                    for kind in ENGINE_KINDS},
+        "versions": {mood: bundle["version"] for mood, bundle in artifacts.items()},
+    })
+
+def admin_forbidden():
+    """Admin endpoints fail closed: without CHORD_ADMIN_TOKEN configured every call is refused."""
+    return not ADMIN_TOKEN or not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_TOKEN)
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """Reload models and mappings from disk in the background (all moods, or ``{"moods": [...]}``)."""
+    if admin_forbidden():
+        return jsonify({"error": "Forbidden"}), 403
+    if not models_ready.is_set():
+        return jsonify({"error": "Models are still loading"}), 503
+    data = request.get_json(silent=True) or {}
+    reload_targets = data.get("moods", moods)
+    if not isinstance(reload_targets, list) or not all(isinstance(mood, str) for mood in reload_targets):
+        return jsonify({"error": "'moods' must be a list of mood names"}), 400
+    unknown = [mood for mood in reload_targets if mood not in moods]
+    if unknown:
+        return jsonify({"error": f"Unknown moods {unknown}"}), 400
+    if reload_lock.locked():
+        return jsonify({"error": "A reload is already running"}), 409
+    threading.Thread(target=reload_moods, args=(reload_targets,), name="reload", daemon=True).start()
+    current = {mood: artifacts[mood]["version"] for mood in reload_targets if mood in artifacts}
+    return jsonify({"reloading": reload_targets, "versions": current}), 202
+
+@app.route('/admin/cache', methods=['GET'])
+def admin_cache():
+    """Hit/miss/error counts and lookup latency per result cache tier."""
+    if admin_forbidden():
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify({"tiers": result_cache.stats_dict(), "coalesced": in_flight.coalesced})
+
+@app.route('/admin/memory', methods=['GET'])
+def admin_memory():
+    """Process RSS and what the models, caches and queues are holding right now."""
+    if admin_forbidden():
+        return jsonify({"error": "Forbidden"}), 403
+    models = {}
+    for mood, bundle in artifacts.items():
+        for kind, engine in bundle["engines"].items():
+            models.setdefault(kind, {})[mood] = engine_bytes(engine)
+    caches = {name: cache_tier_bytes(tier) for name, tier in result_cache.tiers}
+    rss = rss_mb()
+    return jsonify({
+        "rss_mb": round(rss, 1) if rss is not None else None,
+        "model_bytes": models,
+        "model_bytes_total": sum(sum(per_mood.values()) for per_mood in models.values()),
+        "caches": caches,
+        "queues": {"in_flight_decodes": len(in_flight), "log_records": log_queue.qsize(),
+                   "threads": threading.active_count(), "admission": admission.stats(),
+                   "shadow_pending": shadow.pending},
+        "tracemalloc": memory_snapshots.status(),
+    })
+
+@app.route('/admin/memory/snapshot', methods=['POST', 'DELETE'])
+def admin_memory_snapshot():
+    """
+    POST starts tracemalloc on first use, then diffs each new snapshot against
+    the previous one. DELETE stops tracing and frees its memory.
+    """
+    if admin_forbidden():
+        return jsonify({"error": "Forbidden"}), 403
+    if request.method == 'DELETE':
+        return jsonify({"stopped": memory_snapshots.stop()})
+    return jsonify(memory_snapshots.snapshot(int(request.args.get("limit", 20))))
+
+@app.route('/admin/experiments', methods=['GET'])
+def admin_experiments():
+    """A/B and shadow setup, per-engine latency percentiles and shadow agreement with the primary."""
+    if admin_forbidden():
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify({
+        "split": {"arms": dict(AB_SPLIT), "key": AB_KEY},
+        "shadow": {"engines": SHADOW_ENGINES, "sample_rate": SHADOW_SAMPLE_RATE,
+                   "pending": shadow.pending, "dropped": shadow.dropped},
+        **engine_stats.report(),
+    })
 
 @app.route('/generate-progression', methods=['POST'])
 def generate_progression():
+    started = time.perf_counter()
     data = request.get_json()
     if not data or 'sequence' not in data or 'steps' not in data or 'mood' not in data:
         return jsonify({"error": "Invalid input data"}), 400
 
     sequence = data['sequence']
-    steps = int(data['steps'])
+    steps = data['steps']
     mood = data['mood']
+    engine_name = data.get('engine')
+    if type(steps) is not int or not 1 <= steps <= MAX_STEPS:
+        return jsonify({"error": f"'steps' must be an integer between 1 and {MAX_STEPS}"}), 400
+    deadline_ms = data.get('deadline_ms', DEADLINE_MS)
+    if type(deadline_ms) not in (int, float) or not math.isfinite(deadline_ms) or deadline_ms <= 0:
+        return jsonify({"error": "'deadline_ms' must be a positive number"}), 400
+    # Callers may ask for a tighter deadline than the server's, never a looser one.
+    deadline_ms = min(deadline_ms, DEADLINE_MS)
+    deadline = started + deadline_ms / 1000
+
+    if engine_name is not None and engine_name not in ENGINE_KINDS:
+        return jsonify({"error": f"Unknown engine '{engine_name}'"}), 400
+
+    # Everything below uses this one bundle, even if a reload swaps in a new one.
+    bundle = artifacts.get(mood)
+    # Requests that do not name an engine are split among the arms this mood actually has.
+    ab_arm = None
+    arms = [(arm, weight) for arm, weight in AB_SPLIT if weight > 0 and bundle and arm in bundle["engines"]]
+    if engine_name is None and arms:
+        client_id = (request.headers.get(CLIENT_ID_HEADER) or request.remote_addr) if AB_KEY == "client" else None
+        engine_name = ab_arm = assign_arm(arms, client_id)
+    engine_name = engine_name or 'keras'
+    engine = bundle["engines"].get(engine_name) if bundle else None
+    mapping = bundle["mapping"] if bundle else None
+
+    if not engine or not mapping:
+        return jsonify({"error": f"No {engine_name} model or mappings found for mood '{mood}'"}), 400
 
-    model = models.get(mood)
-    mapping = mappings.get(mood)
+    decoder = data.get('decoder', 'greedy')
+    if decoder not in ('greedy', 'speculative'):
+        return jsonify({"error": f"Unknown decoder '{decoder}'"}), 400
 
-    if not model or not mapping:
-        return jsonify({"error": f"No model or mappings found for mood '{mood}'"}), 400
+    drafter_name = drafter = draft_length = None
+    if decoder == 'speculative':
+        drafter_name = data.get('drafter', 'ngram')
+        if not isinstance(drafter_name, str) or drafter_name not in ENGINE_KINDS:
+            return jsonify({"error": f"Unknown drafter '{drafter_name}'"}), 400
+        drafter = bundle["engines"].get(drafter_name)
+        if not drafter:
+            return jsonify({"error": f"No {drafter_name} drafter found for mood '{mood}'"}), 400
+        draft_length = data.get('draft_length', 4)
+        if type(draft_length) is not int or not 1 <= draft_length <= MAX_DRAFT_LENGTH:
+            return jsonify({"error": f"'draft_length' must be an integer between 1 and {MAX_DRAFT_LENGTH}"}), 400
 
-    chord_to_index = mapping['chord_to_index']
-    index_to_chord = {int(k): v for k, v in mapping['index_to_chord'].items()}
+    # A stream session continues from the hidden state returned last time.
+    state = data.get('state')
+    if state is not None:
+        if engine_name != 'stream' or decoder != 'greedy':
+            return jsonify({"error": "'state' is only supported by the stream engine with the greedy decoder"}), 400
+        try:
+            state = np.asarray(state, dtype=np.float32)
+        except (TypeError, ValueError):
+            return jsonify({"error": "Invalid state"}), 400
+        if state.shape != (engine.stream.units,) or not np.all(np.isfinite(state)):
+            return jsonify({"error": "Invalid state"}), 400
+
+    # Under latency pressure, greedy requests without carried state may be
+    # served by a cheaper engine; the response says which one was used.
+    requested_engine = engine_name
+    if decoder == 'greedy' and state is None and data.get('fallback', True):
+        engine_name, _ = router.choose(engine_name, bundle["engines"], steps, admission.expected_wait(mood))
+        if engine_name != requested_engine:
+            engine = bundle["engines"][engine_name]
+            fallbacks_total.inc(mood=mood, requested=requested_engine, served=engine_name)
+
+    stage_seconds.observe(time.perf_counter() - started, stage="parse", mood=mood, engine=engine_name)
+    stage = functools.partial(traced_stage, mood=mood, engine=engine_name)
 
-    input_sequence = [chord_to_index.get(chord) for chord in sequence if chord in chord_to_index]
-    if len(input_sequence) < 3:
+    with stage(stage="lookup"):
+        chord_to_index = mapping['chord_to_index']
+        index_to_chord = {int(k): v for k, v in mapping['index_to_chord'].items()}
+        input_sequence = [chord_to_index.get(chord) for chord in sequence if chord in chord_to_index]
+    if len(input_sequence) < 3 and state is None:
         return jsonify({"error": "Input sequence too short"}), 400
+    if ab_arm:
+        ab_assignments_total.inc(mood=mood, engine=ab_arm)
+
+    decoder_key = (decoder, drafter_name, draft_length) if decoder == 'speculative' else (decoder,)
+    state_key = None if state is None else hashlib.sha1(state.tobytes()).hexdigest()
+    result_key = cache_key("gen", mood, bundle["version"], engine_name, tuple(input_sequence), steps,
+                           decoder_key, state_key)
+
+    def decode():
+        new_state = None
+        queued = time.perf_counter()
+        slot = nullcontext() if engine_name in UNQUEUED_ENGINES else admission.admit(mood, deadline)
+        with slot, tracer.span("inference", engine=engine_name, decoder=decoder, steps=steps):
+            decode_started = time.perf_counter()
+            stage_seconds.observe(decode_started - queued, stage="queue", mood=mood, engine=engine_name)
+            timed_engine = TimedEngine(
+                engine, stage_seconds.labels(stage="inference_step", mood=mood, engine=engine_name).observe)
+            if engine_name == 'stream' and decoder == 'greedy':
+                # One cell update per chord, cheaper than a histogram observation; timed as a whole below.
+                predicted_indices, new_state = generate_stream(engine, input_sequence, steps, state, deadline)
+            elif decoder == 'speculative':
+                timed_drafter = TimedEngine(
+                    drafter, stage_seconds.labels(stage="draft_step", mood=mood, engine=drafter_name).observe)
+                predicted_indices = generate_speculative(timed_engine, timed_drafter, input_sequence, steps,
+                                                         draft_length, deadline=deadline)
+            elif hasattr(engine, 'predict_block'):
+                predicted_indices = generate_multistep(timed_engine, input_sequence, steps, deadline)
+            else:
+                predicted_indices = generate(timed_engine, input_sequence, steps, deadline)
+            elapsed = time.perf_counter() - decode_started
+            router.observe(engine_name, elapsed, len(predicted_indices))
+            engine_stats.record_latency(engine_name, "primary", elapsed, len(predicted_indices))
+        return encode_result(predicted_indices, new_state)
 
     progression = sequence[:]
     try:
-        for _ in range(steps):
-            input_sequence_np = np.array(input_sequence[-3:]).reshape(1, 3)
-            prediction = model.predict(input_sequence_np, verbose=0)
-            predicted_chord_index = np.argmax(prediction)
+        with stage(stage="generate") as span:
+            # A progression cut short by its deadline is served but never cached.
+            payload, cache_source = get_or_compute(result_cache, in_flight, result_key, decode,
+                                                   lambda payload: len(decode_result(payload)[0]) == steps)
+            if span is not None:
+                span.set("cache", cache_source)
+                span.set("steps", steps)
+        predicted_indices, new_state = decode_result(payload)
+        for predicted_chord_index in predicted_indices:
             predicted_chord = index_to_chord.get(predicted_chord_index)
             if not predicted_chord:
                 return jsonify({"error": f"Predicted chord index {predicted_chord_index} not found"}), 500
             progression.append(predicted_chord)
-            input_sequence.append(predicted_chord_index)
+    except Rejected as e:
+        rejections_total.inc(mood=mood, reason=e.reason)
+        response = jsonify({"error": "Server is busy, retry later", "reason": e.reason})
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response, e.status
     except Exception as e:
-        print(f"❌ Error generating progression for '{mood}': {e}")
+        logger.exception("Error generating progression for '%s'", mood)
         return jsonify({"error": f"Error generating progression: {str(e)}"}), 500
 
-    midi_filename = f"progression_{mood}.mid"
-    create_midi(progression, midi_filename)
+    progressions_total.inc(mood=mood, engine=engine_name, cache=cache_source.split("-")[0])
+    truncated = len(predicted_indices) < steps
+    if truncated:
+        truncated_total.inc(mood=mood, engine=engine_name)
+    elif state is None:
+        # Shadow engines see the same input off the request path; their output is only logged and scored.
+        shadow.submit(mood, bundle, engine_name, input_sequence, predicted_indices)
+    midi_filename = write_progression_midi(mood, progression, stage)
 
     try:
-        conn = sqlite3.connect('predictions.db')
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO predictions (mood, input_sequence, generated_progression)
-            VALUES (?, ?, ?)
-        """, (mood, ','.join(sequence), ','.join(progression)))
-        conn.commit()
-        conn.close()
+        with stage(stage="db_insert"):
+            insert_prediction(mood, sequence, progression, engine=engine_name)
     except Exception as db_error:
-        print(f"⚠️ SQLite DB error: {db_error}")
-
-    return jsonify({"full_progression": progression, "midi_file": midi_filename})
-
-def create_midi(chords, filename):
-    midi = MIDIFile(1)
-    track = 0
-    time = 0
-    midi.addTrackName(track, time, "Chord Progression")
-    midi.addTempo(track, time, 120)
-    for chord in chords:
-        if chord in chord_to_notes:
-            for note in chord_to_notes[chord]:
-                midi.addNote(track, 0, note, time, 1, 100)
-        time += 1
-    with open(filename, "wb") as output_file:
-        midi.writeFile(output_file)
+        logger.warning("SQLite DB error: %s", db_error)
+
+    response = {"full_progression": progression, "midi_file": midi_filename, "model_version": bundle["version"],
+                "truncated": truncated, "engine": engine_name}
+    if engine_name != requested_engine:
+        response["requested_engine"] = requested_engine
+    if ab_arm:
+        response["ab_arm"] = ab_arm
+    if new_state is not None:
+        response["state"] = [round(float(v), 6) for v in new_state]
+    response = jsonify(response)
+    response.headers["X-Cache"] = cache_source
+    return response
+
+def write_progression_midi(mood, progression, stage):
+    """Write the mood's MIDI file, skipping the write if it already holds ``progression``."""
+    midi_filename = f"progression_{mood}.mid"
+
+    def render():
+        with stage(stage="midi_render"):
+            return render_midi(progression)
+
+    if last_midi.get(mood) == progression and os.path.exists(midi_filename):
+        return midi_filename
+    data, _ = get_or_compute(result_cache, in_flight, cache_key("midi", tuple(progression)), render)
+    with midi_locks[mood]:
+        with stage(stage="file_write"):
+            with open(midi_filename, "wb") as output_file:
+                output_file.write(data)
+        last_midi[mood] = list(progression)
+    return midi_filename
 
 @app.route('/download-midi/<mood>', methods=['GET'])
 def download_midi(mood):
@@ -146,12 +738,7 @@ def download_midi(mood):
 
 @app.route('/view-predictions', methods=['GET'])
 def view_predictions():
-    conn = sqlite3.connect('predictions.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, mood, input_sequence, generated_progression, timestamp FROM predictions ORDER BY timestamp DESC")
-    rows = cursor.fetchall()
-    conn.close()
-    return jsonify(rows)
+    return jsonify(fetch_predictions())
 
 @app.route('/play-note/<note>', methods=['GET'])
 def play_note(note):
@@ -163,19 +750,15 @@ def play_note(note):
     os.makedirs("static/midi", exist_ok=True)
 
     if not os.path.exists(midi_filename):
-        midi = MIDIFile(1)
-        track = 0
-        time = 0
-        midi.addTrackName(track, time, f"Note {note}")
-        midi.addTempo(track, time, 120)
-        for pitch in chord_to_notes[note]:
-            midi.addNote(track, 0, pitch, time, 1, 100)
-        with open(midi_filename, "wb") as output_file:
-            midi.writeFile(output_file)
+        with stage_seconds.time(stage="midi_render", mood="none", engine="none"):
+            data = render_midi([note], f"Note {note}")
+        with stage_seconds.time(stage="file_write", mood="none", engine="none"):
+            with open(midi_filename, "wb") as output_file:
+                output_file.write(data)
 
     return send_file(midi_filename, as_attachment=False)
 
 
 if __name__ == '__main__':
-    print("🚀 Starting Flask server...")
+    logger.info("Starting Flask server...")
     app.run(debug=True)
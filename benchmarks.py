@@ -0,0 +1,284 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+RESULTS_PATH = "benchmarks/latest.json"
+BASELINE_PATH = "benchmarks/baseline.json"
+MOOD = "happy"
+SEED = ["C", "G", "Am"]
+
+CASES = []
+
+
+def case(name):
+    """Register a benchmark. The decorated setup function returns the callable to time."""
+    def register(setup):
+        CASES.append((name, setup))
+        return setup
+    return register
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the progress prints of the code under test."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+# --- Inference -----------------------------------------------------------
+
+_loaded = {}
+
+
+def keras_model():
+    if "model" not in _loaded:
+        from tensorflow.keras.models import load_model
+        _loaded["model"] = load_model(f"models/{MOOD}_chord_model.h5")
+    return _loaded["model"]
+
+
+def mood_indices(sequence):
+    with open(f"mappings/{MOOD}_mappings.json") as f:
+        chord_to_index = json.load(f)["chord_to_index"]
+    return [chord_to_index[chord] for chord in sequence]
+
+
+def register_backend_cases():
+    from inference_backends import BACKENDS
+
+    for name in BACKENDS:
+        def setup(name=name):
+            from inference_backends import make_backend
+            backend = make_backend(keras_model(), name)
+            window = np.array([mood_indices(SEED)], dtype=np.int32)
+            return lambda: backend(window)
+        case(f"inference_step/{name}")(setup)
+
+
+def engine_factories():
+    """Engines worth timing end to end; the Keras one uses the benchmarked backend pick."""
+    from engines import KerasEngine, NGramEngine, StudentEngine
+    from ngram_model import NGramModel, ngram_path
+    from student_model import StudentModel, student_path
+
+    def keras():
+        from inference_backends import make_backend
+        return KerasEngine(keras_model(), make_backend(keras_model(), "auto"))
+
+    return {
+        "keras": keras,
+        "ngram": lambda: NGramEngine(NGramModel.load(ngram_path(MOOD))),
+        "student": lambda: StudentEngine(StudentModel.load(student_path(MOOD))),
+    }
+
+
+def register_generation_cases():
+    for engine_name in ("keras", "ngram", "student"):
+        for steps in (4, 32, 256):
+            def setup(engine_name=engine_name, steps=steps):
+                from engines import generate
+                engine = engine_factories()[engine_name]()
+                seed = mood_indices(SEED)
+                return lambda: generate(engine, seed, steps)
+            case(f"generate/{engine_name}/steps={steps}")(setup)
+
+    for steps in (4, 32, 256):
+        def setup(steps=steps):
+            from engines import StreamEngine, generate_stream
+            from stream_model import StreamModel, stream_path
+            engine = StreamEngine(StreamModel.load(stream_path(MOOD)))
+            seed = mood_indices(SEED)
+            return lambda: generate_stream(engine, seed, steps)
+        case(f"generate/stream/steps={steps}")(setup)
+
+
+# --- Serving paths ---------------------------------------------------------
+
+def register_midi_cases():
+    for length in (4, 32, 256):
+        def setup(length=length):
+            from generate_midi import render_midi
+            chords = (SEED + ["F"]) * (length // 4)
+            return lambda: render_midi(chords)
+        case(f"render_midi/chords={length}")(setup)
+
+    def setup_create_midi():
+        from generate_midi import create_midi
+        chords = (SEED + ["F"]) * 8
+        # An absolute path keeps the file out of static/midi.
+        path = os.path.join(tempfile.mkdtemp(prefix="chord-bench-"), "benchmark.mid")
+
+        def run():
+            with quiet():
+                create_midi(chords, path)
+        return run
+    case("create_midi/chords=32")(setup_create_midi)
+
+
+@case("sqlite_insert")
+def setup_sqlite_insert():
+    from predictions_db import init_db, insert_prediction
+    path = os.path.join(tempfile.mkdtemp(prefix="chord-bench-"), "predictions.db")
+    init_db(path)
+    progression = SEED * 11
+    return lambda: insert_prediction(MOOD, SEED, progression, path)
+
+
+@case("load_mappings")
+def setup_load_mappings():
+    def run():
+        with open(f"mappings/{MOOD}_mappings.json") as f:
+            return json.load(f)
+    return run
+
+
+@case("preprocess_data")
+def setup_preprocess_data():
+    with quiet():
+        import train_mood_model as tm
+    return lambda: tm.preprocess_data(tm.chord_data, MOOD)
+
+
+register_backend_cases()
+register_generation_cases()
+register_midi_cases()
+
+
+# --- Runner ------------------------------------------------------------------
+
+def measure(fn, warmup, repeats, min_time):
+    """
+    Per-call timings in milliseconds.
+
+    Calls faster than ~50µs are timed in batches so the timer's own cost
+    does not dominate; the batch mean is recorded as one sample.
+    """
+    for _ in range(warmup):
+        fn()
+
+    start = time.perf_counter()
+    fn()
+    estimate = time.perf_counter() - start
+    batch = max(1, int(5e-5 / max(estimate, 1e-9)))
+    # Slow cases get fewer repeats, but never fewer than 5 samples.
+    repeats = max(5, min(repeats, int(min_time / max(estimate * batch, 1e-9))))
+
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(batch):
+            fn()
+        samples.append((time.perf_counter() - start) / batch * 1000)
+    return np.array(samples)
+
+
+def summarize(samples):
+    q25, median, q75 = np.percentile(samples, [25, 50, 75])
+    return {
+        "median_ms": float(median),
+        "iqr_ms": float(q75 - q25),
+        "min_ms": float(samples.min()),
+        "mean_ms": float(samples.mean()),
+        "samples": int(len(samples)),
+    }
+
+
+def environment():
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+    if "tensorflow" in sys.modules:
+        info["tensorflow"] = sys.modules["tensorflow"].__version__
+    try:
+        info["commit"] = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                        text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    return info
+
+
+def compare(results, baseline, threshold):
+    """
+    Cases whose median got slower than the baseline by more than
+    ``threshold`` (relative) and by more than the larger of the two IQRs.
+    """
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        change = result["median_ms"] / before["median_ms"] - 1
+        noise = max(result["iqr_ms"], before["iqr_ms"])
+        if change > threshold and result["median_ms"] - before["median_ms"] > noise:
+            regressions.append((name, before["median_ms"], result["median_ms"], change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the chord generation hot paths.")
+    parser.add_argument("--filter", nargs="+", help="Only run cases whose name contains one of these strings.")
+    parser.add_argument("--list", action="store_true", help="List the cases and exit.")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--min-time", type=float, default=2.0,
+                        help="Target seconds of measurement per case; slow cases get fewer repeats.")
+    parser.add_argument("--output", default=RESULTS_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help=f"Also save the results as '{BASELINE_PATH}'.")
+    parser.add_argument("--compare", nargs="?", const=BASELINE_PATH,
+                        help="Compare against a baseline file and exit 1 on regressions.")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative slowdown of the median that counts as a regression.")
+    args = parser.parse_args()
+
+    selected = [(name, setup) for name, setup in CASES
+                if not args.filter or any(pattern in name for pattern in args.filter)]
+    if args.list:
+        for name, _ in selected:
+            print(name)
+        return
+
+    results = {}
+    print(f"{'case':<34} {'median ms':>11} {'IQR ms':>10} {'samples':>8}")
+    for name, setup in selected:
+        try:
+            fn = setup()
+            samples = measure(fn, args.warmup, args.repeats, args.min_time)
+        except Exception as e:
+            print(f"❌ {name}: {e}")
+            continue
+        results[name] = summarize(samples)
+        r = results[name]
+        print(f"{name:<34} {r['median_ms']:>11.4f} {r['iqr_ms']:>10.4f} {r['samples']:>8}")
+
+    report = {"environment": environment(), "created_at": time.time(), "results": results}
+    paths = [args.output] + ([BASELINE_PATH] if args.save_baseline else [])
+    for path in paths:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Saved results to '{path}'")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after, change in regressions:
+            print(f"⚠️ Regression in {name}: {before:.4f} ms -> {after:.4f} ms ({change:+.1%})")
+        if regressions:
+            sys.exit(1)
+        print(f"✅ No regressions against '{args.compare}' (threshold {args.threshold:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,19 @@
+import os
 import dash
 from dash import html, dcc, Input, Output, State
 import dash_bootstrap_components as dbc
 import requests
 import plotly.graph_objects as go
+from tracing import make_tracer
 
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 server = app.server
 app.title = "AI Mood Chord Progression Generator"
 
+# Spans go to the same file as app.py's so trace_viewer.py shows both sides of a request.
+tracer = make_tracer("dash_app", os.environ.get("CHORD_TRACE_PATH"),
+                     float(os.environ.get("CHORD_TRACE_SAMPLE_RATE", "1")))
+
 def create_interactive_piano_figure():
     # Build two octaves of piano keys
     keys = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"] * 2
@@ -222,6 +228,7 @@ app.layout = dbc.Container(
     State("input-steps", "value"),
     State("input-mood", "value")
 )
+@tracer.traced("callback generate_progression")
 def generate_progression(n_clicks, input_sequence, steps, mood):
     if n_clicks > 0:
         if not input_sequence or not steps or not mood:
@@ -229,7 +236,12 @@ def generate_progression(n_clicks, input_sequence, steps, mood):
         sequence = [chord.strip() for chord in input_sequence.split(",")]
         payload = {"sequence": sequence, "steps": steps, "mood": mood}
         try:
-            response = requests.post("http://127.0.0.1:5000/generate-progression", json=payload)
+            with tracer.span("POST /generate-progression", kind="client", mood=mood, steps=steps) as span:
+                # The traceparent header lets app.py continue this trace.
+                response = requests.post("http://127.0.0.1:5000/generate-progression", json=payload,
+                                         headers=tracer.inject({}))
+                if span is not None:
+                    span.set("status_code", response.status_code)
             if response.status_code == 200:
                 response_data = response.json()
                 progression = response_data.get("full_progression", [])
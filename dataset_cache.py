@@ -0,0 +1,218 @@
+import hashlib
+import json
+import mmap
+import os
+import numpy as np
+
+CACHE_DIR = "datasets/.cache"
+CACHE_FORMAT_VERSION = 1
+_MAGIC = b"CHRDSET1"
+_ALIGNMENT = 64
+
+# Everything that changes how the CSV is turned into tokens belongs here, so
+# that editing the preprocessing invalidates old cache files.
+PREPROCESSING_CONFIG = {
+    "format": CACHE_FORMAT_VERSION,
+    "columns": ["chord sequence", "mood"],
+    "normalize_columns": "strip+lower",
+    "dropna": True,
+    "tokenizer": "whitespace",
+    "vocabulary": "sorted",
+}
+
+
+def load_chord_dataset(filepath):
+    # pandas is only needed when the cache has to be (re)built.
+    import pandas as pd
+
+    df = pd.read_csv(filepath)
+    df.columns = df.columns.str.strip().str.lower()
+    required_columns = ["chord sequence", "mood"]
+
+    if not all(col in df.columns for col in required_columns):
+        raise ValueError(f"Missing required columns. Found: {df.columns}")
+
+    df = df.dropna()
+    df["chord sequence"] = df["chord sequence"].astype(str)
+    return df[["chord sequence", "mood"]]
+
+
+def dataset_fingerprint(csv_path, config=PREPROCESSING_CONFIG):
+    """Hash of the CSV contents and the preprocessing config."""
+    digest = hashlib.sha256()
+    with open(csv_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    digest.update(json.dumps(config, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ChordDataset:
+    """
+    Tokenized chord sequences stored as one flat int array plus row offsets.
+
+    Row ``i`` is ``tokens[offsets[i]:offsets[i + 1]]`` and has mood
+    ``moods[mood_ids[i]]``. When loaded from the cache the arrays are views
+    over a read-only memory map.
+    """
+
+    def __init__(self, tokens, offsets, mood_ids, vocabulary, moods, key, buffer=None):
+        self.tokens = tokens
+        self.offsets = offsets
+        self.mood_ids = mood_ids
+        self.vocabulary = list(vocabulary)
+        self.moods = list(moods)
+        self.key = key
+        self._buffer = buffer
+
+    @property
+    def chord_to_index(self):
+        return {chord: i for i, chord in enumerate(self.vocabulary)}
+
+    @property
+    def index_to_chord(self):
+        return {i: chord for i, chord in enumerate(self.vocabulary)}
+
+    def __len__(self):
+        return len(self.mood_ids)
+
+    def mood_rows(self, mood):
+        """Indices of the rows labelled with ``mood``."""
+        if mood not in self.moods:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(self.mood_ids == self.moods.index(mood))
+
+    def mood_tokens(self, mood):
+        """All tokens of ``mood`` concatenated in CSV order."""
+        if mood not in self.moods:
+            return np.empty(0, dtype=self.tokens.dtype)
+        token_moods = np.repeat(self.mood_ids, np.diff(self.offsets))
+        return self.tokens[token_moods == self.moods.index(mood)]
+
+    def close(self):
+        self.tokens = self.offsets = self.mood_ids = None
+        if self._buffer is not None:
+            self._buffer.close()
+            self._buffer = None
+
+
+def build_dataset(csv_path, key=None):
+    """Tokenize the CSV into a ``ChordDataset`` without touching the cache."""
+    df = load_chord_dataset(csv_path)
+    rows = [seq.strip().split() for seq in df["chord sequence"]]
+
+    vocabulary = sorted({chord for row in rows for chord in row})
+    chord_to_index = {chord: i for i, chord in enumerate(vocabulary)}
+
+    moods = list(df["mood"].unique())
+    mood_to_id = {mood: i for i, mood in enumerate(moods)}
+
+    lengths = np.fromiter((len(row) for row in rows), dtype=np.int64, count=len(rows))
+    offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    tokens = np.fromiter((chord_to_index[ch] for row in rows for ch in row),
+                         dtype=np.int32, count=int(offsets[-1]))
+    mood_ids = np.fromiter((mood_to_id[m] for m in df["mood"]), dtype=np.int32, count=len(rows))
+
+    return ChordDataset(tokens, offsets, mood_ids, vocabulary, moods, key)
+
+
+def _cache_path(csv_path, key):
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(CACHE_DIR, f"{stem}-{key[:16]}.bin")
+
+
+def write_cache(dataset, path):
+    arrays = {"tokens": dataset.tokens, "offsets": dataset.offsets, "mood_ids": dataset.mood_ids}
+
+    # Lay the arrays out after the header, each aligned for zero-copy views.
+    layout = {}
+    position = 0
+    for name, array in arrays.items():
+        layout[name] = {"offset": position, "dtype": array.dtype.str, "shape": list(array.shape)}
+        position += -(-array.nbytes // _ALIGNMENT) * _ALIGNMENT
+
+    header = json.dumps({
+        "key": dataset.key,
+        "vocabulary": dataset.vocabulary,
+        "moods": dataset.moods,
+        "arrays": layout,
+    }).encode("utf-8")
+    data_start = -(-(len(_MAGIC) + 4 + len(header)) // _ALIGNMENT) * _ALIGNMENT
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_MAGIC)
+        f.write(len(header).to_bytes(4, "little"))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + position)
+    os.replace(tmp_path, path)
+
+
+def read_cache(path):
+    """Memory-map a cache file. Returns ``None`` if it is missing or unreadable."""
+    try:
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        if buffer[:len(_MAGIC)] != _MAGIC:
+            raise ValueError("bad magic")
+        header_length = int.from_bytes(buffer[len(_MAGIC):len(_MAGIC) + 4], "little")
+        header_end = len(_MAGIC) + 4 + header_length
+        header = json.loads(buffer[len(_MAGIC) + 4:header_end])
+        data_start = -(-header_end // _ALIGNMENT) * _ALIGNMENT
+
+        arrays = {}
+        for name, spec in header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"]))
+            arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count,
+                                         offset=data_start + spec["offset"]).reshape(spec["shape"])
+    except (ValueError, KeyError, TypeError) as e:
+        buffer.close()
+        print(f"⚠️ Ignoring unreadable dataset cache '{path}': {e}")
+        return None
+
+    return ChordDataset(arrays["tokens"], arrays["offsets"], arrays["mood_ids"],
+                        header["vocabulary"], header["moods"], header["key"], buffer=buffer)
+
+
+def load_cached_dataset(csv_path, config=PREPROCESSING_CONFIG):
+    """
+    Load the tokenized dataset for ``csv_path``, building the cache on first use.
+    """
+    key = dataset_fingerprint(csv_path, config)
+    path = _cache_path(csv_path, key)
+
+    dataset = read_cache(path)
+    if dataset is not None and dataset.key == key:
+        return dataset
+
+    dataset = build_dataset(csv_path, key=key)
+    try:
+        _remove_stale_caches(csv_path, keep=path)
+        write_cache(dataset, path)
+        print(f"✅ Dataset cache written to '{path}'")
+    except OSError as e:
+        print(f"⚠️ Could not write dataset cache '{path}': {e}")
+    return dataset
+
+
+def _remove_stale_caches(csv_path, keep):
+    if not os.path.isdir(CACHE_DIR):
+        return
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    for name in os.listdir(CACHE_DIR):
+        path = os.path.join(CACHE_DIR, name)
+        if name.startswith(f"{stem}-") and name.endswith(".bin") and path != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,75 @@
+import threading
+import time
+
+
+class EngineRouter:
+    """
+    Picks the engine that serves a request, from recent latencies.
+
+    ``observe`` keeps an exponential moving average of the seconds per
+    generated chord for each engine. A request is expected to take its queue
+    delay plus ``steps`` times that; when this would break the ``slo``
+    (seconds), the request moves to the first engine in ``fallbacks[engine]``
+    expected to meet it, or to the last one if none is. Engines in
+    ``unqueued`` skip the admission queue, so no queue delay is added for
+    them. An engine without observations yet is assumed to be fast enough.
+
+    An engine that lost its traffic to a fallback is no longer measured, so
+    once its estimate is ``probe_after`` seconds old one request is let
+    through to it again; that is how the router notices it has recovered.
+    """
+
+    def __init__(self, slo, fallbacks, unqueued=(), alpha=0.2, probe_after=5.0):
+        self.slo = slo
+        self.fallbacks = fallbacks
+        self.unqueued = set(unqueued)
+        self.alpha = alpha
+        self.probe_after = probe_after
+        self._per_step = {}
+        self._observed_at = {}
+        self._probing = set()
+        self._lock = threading.Lock()
+
+    def observe(self, engine, seconds, steps):
+        if steps <= 0:
+            return
+        per_step = seconds / steps
+        with self._lock:
+            previous = self._per_step.get(engine)
+            if previous is None or engine in self._probing:
+                # A probe replaces the stale estimate rather than nudging it.
+                self._probing.discard(engine)
+                self._per_step[engine] = per_step
+            else:
+                self._per_step[engine] = previous + self.alpha * (per_step - previous)
+            self._observed_at[engine] = time.monotonic()
+
+    def expected(self, engine, steps, queue_delay):
+        per_step = self._per_step.get(engine)
+        if per_step is None:
+            return None
+        return (0.0 if engine in self.unqueued else queue_delay) + steps * per_step
+
+    def choose(self, requested, available, steps, queue_delay=0.0):
+        """``(engine, expected seconds for the requested engine)``; the engine is ``requested`` unless it moved."""
+        expected = self.expected(requested, steps, queue_delay)
+        if expected is None or expected <= self.slo:
+            return requested, expected
+        with self._lock:
+            now = time.monotonic()
+            if now - self._observed_at.get(requested, now) > self.probe_after:
+                # Claim the probe so concurrent requests keep falling back meanwhile.
+                self._observed_at[requested] = now
+                self._probing.add(requested)
+                return requested, expected
+        candidates = [engine for engine in self.fallbacks.get(requested, ()) if engine in available]
+        for candidate in candidates:
+            candidate_expected = self.expected(candidate, steps, queue_delay)
+            if candidate_expected is None or candidate_expected <= self.slo:
+                return candidate, expected
+        return (candidates[-1] if candidates else requested), expected
+
+    def stats(self):
+        """Current seconds-per-chord estimate of every engine seen so far."""
+        with self._lock:
+            return dict(self._per_step)
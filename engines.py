@@ -0,0 +1,246 @@
+import time
+import numpy as np
+
+CONTEXT_LENGTH = 3
+
+
+def _predict(model):
+    return lambda windows: model.predict(windows, verbose=0)
+
+
+class KerasEngine:
+    """
+    Next-chord predictions from a trained Keras mood model.
+
+    ``backend`` is a callable from ``inference_backends`` that runs the
+    model on a batch of windows; ``model.predict`` is used without one.
+    """
+
+    name = "keras"
+
+    def __init__(self, model, backend=None):
+        self.model = model
+        self.backend = backend or _predict(model)
+
+    def predict_next(self, windows):
+        """Most likely next chord index for each row of ``windows`` (n, 3)."""
+        prediction = self.backend(windows)
+        return np.argmax(prediction, axis=-1)
+
+
+class MultiStepEngine:
+    """
+    Keras model with one softmax head per future position.
+
+    ``predict_block`` returns the next ``horizon`` chords from one forward
+    pass; ``predict_next`` uses only the first head.
+    """
+
+    name = "multistep"
+
+    def __init__(self, model, backend=None):
+        self.model = model
+        self.backend = backend or _predict(model)
+        self.horizon = len(model.outputs)
+
+    def predict_block(self, windows):
+        heads = self.backend(windows)
+        return np.stack([np.argmax(head, axis=-1) for head in heads], axis=1)
+
+    def predict_next(self, windows):
+        return self.predict_block(windows)[:, 0]
+
+
+class NGramEngine:
+    """Next-chord predictions from a count-based ``NGramModel`` table lookup."""
+
+    name = "ngram"
+
+    def __init__(self, ngram):
+        self.ngram = ngram
+
+    def predict_next(self, windows):
+        return self.ngram.predict(windows)
+
+
+class StudentEngine:
+    """Next-chord predictions from a distilled NumPy ``StudentModel``."""
+
+    name = "student"
+
+    def __init__(self, student):
+        self.student = student
+
+    def predict_next(self, windows):
+        return self.student.predict(windows)
+
+
+class StreamEngine:
+    """Next-chord predictions from a streaming NumPy ``StreamModel``."""
+
+    name = "stream"
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def predict_next(self, windows):
+        # Stateless path for callers that only have windows: replay each one
+        # from an empty state. Use ``generate_stream`` to carry state instead.
+        stream = self.stream
+        return np.array([stream.next_index(stream.feed(stream.initial_state(), window))
+                         for window in windows])
+
+
+class TableEngine:
+    """
+    Next-chord lookups in a table of another engine's prediction for every
+    possible context. Since the models only see the last ``CONTEXT_LENGTH``
+    chords, greedy decoding gives exactly the source engine's output.
+    """
+
+    name = "table"
+
+    def __init__(self, best_next, vocab_size):
+        self.best_next = best_next
+        self.vocab_size = vocab_size
+
+    @classmethod
+    def from_engine(cls, engine, vocab_size, batch_size=4096):
+        """Run ``engine`` once over all ``vocab_size ** CONTEXT_LENGTH`` contexts."""
+        contexts = np.indices((vocab_size,) * CONTEXT_LENGTH).reshape(CONTEXT_LENGTH, -1).T.astype(np.int32)
+        best_next = np.concatenate([engine.predict_next(contexts[i:i + batch_size])
+                                    for i in range(0, len(contexts), batch_size)]).astype(np.int32)
+        return cls(best_next, vocab_size)
+
+    def predict_next(self, windows):
+        windows = np.asarray(windows)[:, -CONTEXT_LENGTH:]
+        return self.best_next[np.ravel_multi_index(windows.T, (self.vocab_size,) * CONTEXT_LENGTH)]
+
+
+class TimedEngine:
+    """
+    Wraps an engine and reports the duration in seconds of every
+    ``predict_next``/``predict_block`` call to ``observe``. Everything else
+    is forwarded to the wrapped engine.
+    """
+
+    def __init__(self, engine, observe):
+        self.engine = engine
+        self.observe = observe
+
+    def __getattr__(self, name):
+        return getattr(self.engine, name)
+
+    def predict_next(self, windows):
+        start = time.perf_counter()
+        try:
+            return self.engine.predict_next(windows)
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def predict_block(self, windows):
+        start = time.perf_counter()
+        try:
+            return self.engine.predict_block(windows)
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+def _expired(deadline):
+    return deadline is not None and time.perf_counter() >= deadline
+
+
+def generate(engine, input_sequence, steps, deadline=None):
+    """
+    Greedy decoding: append ``steps`` predicted chord indices to ``input_sequence``.
+
+    Every decoder stops early once ``time.perf_counter()`` passes
+    ``deadline`` and returns the chords generated so far.
+    """
+    indices = list(input_sequence)
+    for _ in range(steps):
+        if _expired(deadline):
+            break
+        window = np.array(indices[-CONTEXT_LENGTH:]).reshape(1, CONTEXT_LENGTH)
+        indices.append(int(engine.predict_next(window)[0]))
+    return indices[len(input_sequence):]
+
+
+def generate_multistep(engine, input_sequence, steps, deadline=None):
+    """
+    Block decoding for engines with ``predict_block``: ``horizon`` chords per
+    forward pass, then one chord at a time for a tail shorter than a block.
+    """
+    indices = list(input_sequence)
+    target_length = len(indices) + steps
+    while target_length - len(indices) >= engine.horizon:
+        if _expired(deadline):
+            return indices[len(input_sequence):]
+        window = np.array(indices[-CONTEXT_LENGTH:]).reshape(1, CONTEXT_LENGTH)
+        indices.extend(int(i) for i in engine.predict_block(window)[0])
+    while len(indices) < target_length and not _expired(deadline):
+        window = np.array(indices[-CONTEXT_LENGTH:]).reshape(1, CONTEXT_LENGTH)
+        indices.append(int(engine.predict_next(window)[0]))
+    return indices[len(input_sequence):]
+
+
+def generate_speculative(engine, drafter, input_sequence, steps, draft_length=4, stats=None, deadline=None):
+    """
+    Greedy decoding with drafts from a cheap ``drafter``.
+
+    The drafter proposes up to ``draft_length`` chords. ``engine`` then scores
+    every drafted position (plus the one after the draft) in a single batched
+    call, and the longest prefix it agrees with is kept, followed by the
+    engine's own choice at the first disagreement. The output is the same as
+    ``generate(engine, ...)`` but needs fewer sequential engine calls.
+    Counters are accumulated into ``stats`` if given.
+    """
+    indices = list(input_sequence)
+    target_length = len(indices) + steps
+    while len(indices) < target_length and not _expired(deadline):
+        draft_size = min(draft_length, target_length - len(indices) - 1)
+
+        draft = []
+        context = indices[-CONTEXT_LENGTH:]
+        for _ in range(draft_size):
+            window = np.array(context[-CONTEXT_LENGTH:]).reshape(1, CONTEXT_LENGTH)
+            draft.append(int(drafter.predict_next(window)[0]))
+            context.append(draft[-1])
+
+        candidate = indices + draft
+        windows = np.array([candidate[len(indices) + i - CONTEXT_LENGTH:len(indices) + i]
+                            for i in range(draft_size + 1)])
+        verified = [int(i) for i in engine.predict_next(windows)]
+
+        accepted = 0
+        while accepted < draft_size and verified[accepted] == draft[accepted]:
+            accepted += 1
+        indices.extend(draft[:accepted])
+        indices.append(verified[accepted])
+
+        if stats is not None:
+            stats["engine_calls"] = stats.get("engine_calls", 0) + 1
+            stats["drafted"] = stats.get("drafted", 0) + draft_size
+            stats["accepted"] = stats.get("accepted", 0) + accepted
+    return indices[len(input_sequence):]
+
+
+def generate_stream(engine, input_sequence, steps, state=None, deadline=None):
+    """
+    Decoding with a carried hidden state, one cell update per chord.
+
+    Without ``state`` the whole ``input_sequence`` is fed from an empty state.
+    With a state returned by an earlier call, only ``input_sequence`` (the
+    chords added since) is fed on top of it. Returns the generated indices
+    and the state after the last of them, ready for the next call.
+    """
+    stream = engine.stream
+    state = stream.feed(stream.initial_state() if state is None else state, input_sequence)
+    generated = []
+    for _ in range(steps):
+        if _expired(deadline):
+            break
+        index = stream.next_index(state)
+        generated.append(index)
+        state = stream.step(state, index)
+    return generated, state
@@ -0,0 +1,156 @@
+import argparse
+import json
+import os
+import time
+import numpy as np
+from tensorflow.keras.models import load_model
+
+import train_mood_model as tm
+from engines import (KerasEngine, MultiStepEngine, NGramEngine, StudentEngine,
+                     generate, generate_multistep, generate_speculative)
+from ngram_model import NGramModel
+from student_model import StudentModel, student_path
+from timing import time_call
+
+REPORT_PATH = "models/engine_comparison.json"
+
+
+def held_out_split(mood):
+    """
+    The train/validation split ``train_mood_model`` trains on, with
+    next-chord targets and the raw occurrence count of each row; None if
+    the mood has too little data.
+    """
+    split = tm.split_dataset(mood, tm.hyperparameters)
+    if split is None:
+        return None
+    X_train, X_test, Y_train, Y_test, _, _, c_train, c_test, _ = split
+    return X_train, Y_train[:, 0], c_train, X_test, Y_test[:, 0], c_test
+
+
+def load_engines(mood, X_train, y_train, c_train):
+    """Engines to compare for one mood, all restricted to the training split."""
+    engines = {}
+    if os.path.exists(tm.model_path(mood)):
+        engines["keras"] = KerasEngine(load_model(tm.model_path(mood)))
+    engines["ngram"] = NGramEngine(NGramModel.fit(X_train, y_train, tm.all_chords, weights=c_train))
+    # Students only ever see the teacher's outputs, never the held-out labels.
+    if os.path.exists(student_path(mood)):
+        engines["student"] = StudentEngine(StudentModel.load(student_path(mood)))
+    return engines
+
+
+def evaluate(engine, X_test, y_test, c_test, steps, repeats):
+    predictions = np.asarray(engine.predict_next(X_test))
+    window = X_test[:1]
+    seed = [int(i) for i in X_test[0]]
+    return {
+        "accuracy": float(np.average(predictions == y_test, weights=c_test)),
+        "step_latency_ms": time_call(lambda: engine.predict_next(window), repeats),
+        f"generate_{steps}_ms": time_call(lambda: generate(engine, seed, steps), max(3, repeats // 20)),
+    }
+
+
+def speculative_report(engine, drafters, seeds, steps, draft_length):
+    """Acceptance rate and speedup of speculative decoding against plain greedy decoding."""
+    start = time.perf_counter()
+    greedy = [generate(engine, seed, steps) for seed in seeds]
+    greedy_seconds = time.perf_counter() - start
+
+    results = {}
+    for name, drafter in drafters.items():
+        stats = {}
+        start = time.perf_counter()
+        outputs = [generate_speculative(engine, drafter, seed, steps, draft_length, stats) for seed in seeds]
+        seconds = time.perf_counter() - start
+        results[name] = {
+            "acceptance_rate": stats["accepted"] / max(stats["drafted"], 1),
+            "engine_calls": stats["engine_calls"],
+            "greedy_engine_calls": steps * len(seeds),
+            "speedup": greedy_seconds / seconds,
+            "identical_to_greedy": sum(o == g for o, g in zip(outputs, greedy)) / len(seeds),
+        }
+    return results
+
+
+def multistep_report(mood, keras_engine, repeats, step_counts=(8, 32, 128)):
+    """Held-out accuracy per head and decode latency of the multi-step variant."""
+    engine = MultiStepEngine(load_model(tm.multistep_model_path(mood), compile=False))
+    hp = tm.variant_hyperparameters(engine.horizon)
+    _, X_test, _, Y_test, _, w_test, _, _, _ = tm.split_dataset(mood, hp)
+
+    predictions = engine.predict_block(X_test)
+    report = {
+        "horizon": engine.horizon,
+        "head_accuracy": [float(np.average(predictions[:, i] == Y_test[:, i], weights=w_test))
+                          for i in range(engine.horizon)],
+        "latency_ms": {},
+    }
+    seed = [int(i) for i in X_test[0]]
+    for steps in step_counts:
+        runs = max(3, repeats // steps)
+        report["latency_ms"][steps] = {
+            "keras": time_call(lambda: generate(keras_engine, seed, steps), runs, warmup=1),
+            "multistep": time_call(lambda: generate_multistep(engine, seed, steps), runs, warmup=1),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare generation engines on held-out windows.")
+    parser.add_argument("--moods", nargs="+")
+    parser.add_argument("--steps", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--speculative", action="store_true",
+                        help="Also report speculative decoding of the Keras model with cheaper drafters.")
+    parser.add_argument("--draft-length", type=int, default=4)
+    parser.add_argument("--multistep", action="store_true",
+                        help="Also compare the multi-step variant against one-chord-per-call decoding.")
+    args = parser.parse_args()
+
+    report = {}
+    for mood in args.moods or tm.chord_data.moods:
+        split = held_out_split(mood)
+        if split is None:
+            print(f"Skipping mood '{mood}' due to insufficient data.")
+            continue
+        X_train, y_train, c_train, X_test, y_test, c_test = split
+        engines = load_engines(mood, X_train, y_train, c_train)
+
+        print(f"\nResults for '{mood}' ({len(X_test)} held-out windows):")
+        print(f"{'engine':<12} {'accuracy':>9} {'ms/step':>10} {f'ms/{args.steps} steps':>14}")
+        report[mood] = {}
+        for name, engine in engines.items():
+            result = evaluate(engine, X_test, y_test, c_test, args.steps, args.repeats)
+            report[mood][name] = result
+            print(f"{name:<12} {result['accuracy']:>9.4f} {result['step_latency_ms']:>10.4f} "
+                  f"{result[f'generate_{args.steps}_ms']:>14.3f}")
+
+        if args.speculative and "keras" in engines:
+            drafters = {name: e for name, e in engines.items() if name != "keras"}
+            seeds = [[int(i) for i in window] for window in X_test[:5]]
+            spec = speculative_report(engines["keras"], drafters, seeds, args.steps, args.draft_length)
+            report[mood]["speculative"] = spec
+            print(f"Speculative decoding (k={args.draft_length}):")
+            print(f"{'drafter':<12} {'accept':>7} {'calls':>11} {'speedup':>8} {'identical':>10}")
+            for name, r in spec.items():
+                print(f"{name:<12} {r['acceptance_rate']:>7.2%} "
+                      f"{r['engine_calls']:>5}/{r['greedy_engine_calls']:<5} {r['speedup']:>7.2f}x "
+                      f"{r['identical_to_greedy']:>10.0%}")
+
+        if args.multistep and "keras" in engines and os.path.exists(tm.multistep_model_path(mood)):
+            multi = multistep_report(mood, engines["keras"], args.repeats)
+            report[mood]["multistep"] = multi
+            heads = ", ".join(f"{a:.4f}" for a in multi["head_accuracy"])
+            print(f"Multi-step K={multi['horizon']}: held-out accuracy per head [{heads}]")
+            print(f"{'steps':>6} {'keras ms':>10} {'multistep ms':>13}")
+            for steps, timing in multi["latency_ms"].items():
+                print(f"{steps:>6} {timing['keras']:>10.2f} {timing['multistep']:>13.2f}")
+
+    with open(REPORT_PATH, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved comparison to '{REPORT_PATH}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import hashlib
+import logging
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+import numpy as np
+
+from admission import Rejected
+from engines import generate, generate_multistep, generate_stream
+
+logger = logging.getLogger(__name__)
+
+
+def parse_split(spec):
+    """``"keras=90,student=10"`` -> ``[("keras", 90.0), ("student", 10.0)]``; empty means no split."""
+    arms = []
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        engine, _, weight = part.partition("=")
+        arms.append((engine.strip(), float(weight or 1)))
+    if any(weight < 0 for _, weight in arms) or (arms and sum(weight for _, weight in arms) <= 0):
+        raise ValueError(f"Invalid split '{spec}'")
+    return arms
+
+
+def assign_arm(arms, client_id=None):
+    """
+    Engine for one request. With a ``client_id`` the choice is a stable hash
+    of it, so a client keeps seeing the same engine; otherwise it is random.
+    """
+    total = sum(weight for _, weight in arms)
+    if client_id is None:
+        point = random.random() * total
+    else:
+        digest = hashlib.sha1(client_id.encode()).digest()
+        point = int.from_bytes(digest[:8], "big") / 2 ** 64 * total
+    for engine, weight in arms:
+        if point < weight:
+            return engine
+        point -= weight
+    return arms[-1][0]
+
+
+class EngineStats:
+    """Recent per-engine latencies and how often shadow engines agree with the primary."""
+
+    def __init__(self, window=2000):
+        self._latencies = defaultdict(lambda: deque(maxlen=window))
+        # (shadow, primary) -> [agreeing positions, positions, exact matches, comparisons]
+        self._agreement = defaultdict(lambda: [0, 0, 0, 0])
+        self._lock = threading.Lock()
+
+    def record_latency(self, engine, role, seconds, steps):
+        with self._lock:
+            self._latencies[(engine, role)].append((seconds, steps))
+
+    def record_agreement(self, shadow, primary, agreeing, positions):
+        with self._lock:
+            counts = self._agreement[(shadow, primary)]
+            counts[0] += agreeing
+            counts[1] += positions
+            counts[2] += agreeing == positions
+            counts[3] += 1
+
+    def report(self):
+        with self._lock:
+            latencies = {key: list(samples) for key, samples in self._latencies.items()}
+            agreement = {key: list(counts) for key, counts in self._agreement.items()}
+        latency_report = {}
+        for (engine, role), samples in sorted(latencies.items()):
+            ms = np.array([seconds for seconds, _ in samples]) * 1000
+            steps = sum(steps for _, steps in samples)
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            latency_report.setdefault(engine, {})[role] = {
+                "count": len(samples), "p50_ms": round(p50, 3), "p95_ms": round(p95, 3), "p99_ms": round(p99, 3),
+                "ms_per_step": round(ms.sum() / max(steps, 1), 4),
+            }
+        agreement_report = {
+            f"{shadow} vs {primary}": {
+                "comparisons": comparisons,
+                "position_agreement": round(agreeing / positions, 4) if positions else None,
+                "exact_match": round(exact / comparisons, 4) if comparisons else None,
+            }
+            for (shadow, primary), (agreeing, positions, exact, comparisons) in sorted(agreement.items())
+        }
+        return {"latency": latency_report, "agreement": agreement_report}
+
+
+def decode_greedy(name, engine, input_sequence, steps):
+    """Greedy decode with the same generation loop the request path uses for this engine."""
+    if name == "stream":
+        return generate_stream(engine, input_sequence, steps)[0]
+    if hasattr(engine, "predict_block"):
+        return generate_multistep(engine, input_sequence, steps)
+    return generate(engine, input_sequence, steps)
+
+
+class ShadowEvaluator:
+    """
+    Runs ``engines`` on a copy of live requests in a background pool and
+    compares their output with what the primary engine served. Nothing here
+    can change or delay a response: at most ``max_pending`` comparisons wait
+    for a worker and anything beyond that is dropped and counted. Engines
+    not in ``unqueued`` also need an idle slot in ``admission``; a shadow
+    run that finds the server busy is dropped rather than queued.
+    """
+
+    def __init__(self, engines, stats, sample_rate=1.0, workers=2, max_pending=64, admission=None, unqueued=()):
+        self.engines = list(engines)
+        self.stats = stats
+        self.sample_rate = sample_rate
+        self.max_pending = max_pending
+        self.admission = admission
+        self.unqueued = set(unqueued)
+        self.dropped = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shadow") if self.engines else None
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def submit(self, mood, bundle, primary, input_sequence, primary_indices):
+        if self._pool is None or random.random() >= self.sample_rate:
+            return
+        shadows = [(name, bundle["engines"][name]) for name in self.engines
+                   if name != primary and name in bundle["engines"]]
+        if not shadows or not primary_indices:
+            return
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pending += 1
+        self._pool.submit(self._run, mood, shadows, primary, list(input_sequence), list(primary_indices))
+
+    def _run(self, mood, shadows, primary, input_sequence, primary_indices):
+        try:
+            for name, engine in shadows:
+                queued = self.admission is not None and name not in self.unqueued
+                try:
+                    with self.admission.admit_if_idle(mood) if queued else nullcontext():
+                        started = time.perf_counter()
+                        indices = decode_greedy(name, engine, input_sequence, len(primary_indices))
+                        seconds = time.perf_counter() - started
+                except Rejected:
+                    with self._lock:
+                        self.dropped += 1
+                    continue
+                agreeing = sum(a == b for a, b in zip(indices, primary_indices))
+                self.stats.record_latency(name, "shadow", seconds, len(indices))
+                self.stats.record_agreement(name, primary, agreeing, len(primary_indices))
+                logger.info("shadow %s vs %s", name, primary, extra={
+                    "event": "shadow", "mood": mood, "shadow": name, "primary": primary,
+                    "input": input_sequence, "primary_output": primary_indices, "shadow_output": indices,
+                    "agreement": round(agreeing / len(primary_indices), 4),
+                    "latency_ms": round(seconds * 1000, 3)})
+        except Exception:
+            logger.exception("Shadow evaluation failed for '%s'", mood)
+        finally:
+            with self._lock:
+                self._pending -= 1
@@ -3,10 +3,25 @@ from flask_cors import CORS
 import random
 import os
 import json
+import logging
 from generate_midi import create_midi 
+from metrics import Registry, instrument_app
+from structured_logging import install_request_ids, setup_logging
+from traffic_capture import install_capture
+
+setup_logging()
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app)  #  Allow requests from any origin
+install_request_ids(app)
+
+registry = Registry()
+instrument_app(app, registry, "chord_game")
+stage_seconds = registry.histogram(
+    "chord_game_stage_seconds", "Time spent in each stage of serving a request, in seconds.", ("stage", "mood"))
+if os.environ.get("CHORD_CAPTURE_PATH"):
+    install_capture(app, os.environ["CHORD_CAPTURE_PATH"], float(os.environ.get("CHORD_CAPTURE_RATE", "1")))
 
 MIDI_FOLDER = "static/midi"
 os.makedirs(MIDI_FOLDER, exist_ok=True) 
@@ -19,9 +34,9 @@ for mood in moods:
     try:
         with open(f'mappings/{mood}_mappings.json', 'r') as f:
             mappings[mood] = json.load(f)
-        print(f" Loaded mappings for mood: {mood}")
+        logger.info("Loaded mappings for mood: %s", mood)
     except Exception as e:
-        print(f" Error loading mappings for '{mood}': {e}")
+        logger.error("Error loading mappings for '%s': %s", mood, e)
 
 selected_mood = "happy"
 current_chord = "C"
@@ -48,11 +63,12 @@ def next_chord():
     if selected_mood not in mappings:
         return jsonify({"error": "Mappings for mood not found!"}), 400
 
-    chord_list = list(mappings[selected_mood]["index_to_chord"].values())
-    if not chord_list:
-        return jsonify({"error": "No chords found for the selected mood!"}), 400
+    with stage_seconds.time(stage="pick_chord", mood=selected_mood):
+        chord_list = list(mappings[selected_mood]["index_to_chord"].values())
+        if not chord_list:
+            return jsonify({"error": "No chords found for the selected mood!"}), 400
 
-    current_chord = random.choice(chord_list)
+        current_chord = random.choice(chord_list)
     return jsonify({"chord": current_chord}), 200
 
 @app.route('/play-chord', methods=['POST'])
@@ -69,11 +85,12 @@ def play_chord():
 
     # Generate the MIDI file if it doesn't exist
     if not os.path.exists(midi_filepath):
-        create_midi([chord], midi_filepath)
+        with stage_seconds.time(stage="midi_write", mood=selected_mood):
+            create_midi([chord], midi_filepath)
 
     midi_url = f"http://127.0.0.1:5002/static/midi/{midi_filename}"
     
-    print(f"🎵 MIDI generated: {midi_url}")  # Debugging
+    logger.debug("MIDI generated: %s", midi_url)
     return jsonify({"midi_url": midi_url}), 200
 
 if __name__ == '__main__':
@@ -0,0 +1,238 @@
+import argparse
+import json
+import os
+import threading
+import time
+import numpy as np
+import tensorflow as tf
+
+BACKEND_CHOICE_PATH = "models/backend_choice.json"
+WARM_UP_BATCH_SIZES = (1, 5)
+
+
+def _to_numpy(outputs):
+    if isinstance(outputs, (list, tuple)):
+        return [np.asarray(o) for o in outputs]
+    return np.asarray(outputs)
+
+
+class PredictBackend:
+    """``model.predict``: builds a data adapter and callbacks on every call."""
+
+    name = "predict"
+
+    def __init__(self, model):
+        self.model = model
+
+    def __call__(self, windows):
+        return self.model.predict(windows, verbose=0)
+
+
+class DirectBackend:
+    """Eager ``model(x, training=False)`` call without the ``predict`` machinery."""
+
+    name = "direct"
+
+    def __init__(self, model):
+        self.model = model
+
+    def __call__(self, windows):
+        return _to_numpy(self.model(np.asarray(windows, dtype=np.int32), training=False))
+
+
+class FunctionBackend:
+    """The model traced once into a ``tf.function`` over a fixed input signature."""
+
+    name = "function"
+    jit_compile = False
+
+    def __init__(self, model):
+        self.model = model
+        signature = [tf.TensorSpec([None, model.inputs[0].shape[1]], tf.int32)]
+        self._function = tf.function(lambda x: model(x, training=False),
+                                     input_signature=signature, jit_compile=self.jit_compile)
+
+    def __call__(self, windows):
+        return _to_numpy(self._function(tf.constant(windows, dtype=tf.int32)))
+
+
+class XLABackend(FunctionBackend):
+    """``FunctionBackend`` compiled with XLA (``jit_compile=True``)."""
+
+    name = "xla"
+    jit_compile = True
+
+
+def _unrolled_copy(model):
+    """
+    The same model with its recurrent layers unrolled.
+
+    The chord windows are only a few steps long. Unrolling removes the
+    TensorList loop that the TFLite builtin ops cannot express, so no Flex
+    delegate is needed.
+    """
+    def unroll(config):
+        if isinstance(config, dict):
+            if config.get("class_name") in ("LSTM", "GRU", "SimpleRNN"):
+                config["config"]["unroll"] = True
+            for value in config.values():
+                unroll(value)
+        elif isinstance(config, list):
+            for value in config:
+                unroll(value)
+
+    config = model.get_config()
+    unroll(config)
+    clone = model.__class__.from_config(config)
+    clone.set_weights(model.get_weights())
+    return clone
+
+
+class TFLiteBackend:
+    """
+    The model converted to TFLite with dynamic-range quantization.
+
+    Weights are stored as int8 and dequantized on the fly. The interpreter is
+    not thread-safe, so calls are serialised with a lock.
+    """
+
+    name = "tflite"
+
+    def __init__(self, model):
+        converter = tf.lite.TFLiteConverter.from_keras_model(_unrolled_copy(model))
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        self.model_content = converter.convert()
+        self.interpreter = tf.lite.Interpreter(model_content=self.model_content)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]["index"]
+        # Output tensors are named "<fn>:<position>"; restore the Keras order.
+        details = self.interpreter.get_output_details()
+        self._outputs = [d["index"] for d in sorted(details, key=lambda d: int(d["name"].rsplit(":", 1)[-1]))]
+        self._multi_output = len(model.outputs) > 1
+        self._batch_size = None
+        self._lock = threading.Lock()
+
+    def __call__(self, windows):
+        windows = np.asarray(windows, dtype=np.float32)
+        with self._lock:
+            if windows.shape[0] != self._batch_size:
+                self.interpreter.resize_tensor_input(self._input, windows.shape)
+                self.interpreter.allocate_tensors()
+                self._batch_size = windows.shape[0]
+            self.interpreter.set_tensor(self._input, windows)
+            self.interpreter.invoke()
+            outputs = [self.interpreter.get_tensor(i).copy() for i in self._outputs]
+        return outputs if self._multi_output else outputs[0]
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (PredictBackend, DirectBackend, FunctionBackend, XLABackend, TFLiteBackend)
+}
+
+
+def load_backend_choice(path=BACKEND_CHOICE_PATH):
+    """Backend picked by the last benchmark run, if any."""
+    try:
+        with open(path, "r") as f:
+            return json.load(f).get("backend")
+    except (OSError, ValueError):
+        return None
+
+
+def make_backend(model, name="direct"):
+    """
+    Build and warm up the backend ``name`` for ``model``.
+
+    ``"auto"`` uses the benchmark's pick from ``BACKEND_CHOICE_PATH`` and
+    falls back to ``"direct"``.
+    """
+    if name == "auto":
+        name = load_backend_choice() or "direct"
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}'. Choose from {sorted(BACKENDS)}.")
+
+    backend = BACKENDS[name](model)
+    # Trigger tracing, compilation and tensor allocation before serving.
+    context = model.inputs[0].shape[1]
+    for batch_size in WARM_UP_BATCH_SIZES:
+        backend(np.zeros((batch_size, context), dtype=np.int32))
+    return backend
+
+
+def benchmark(model, names=None, repeats=300, batch_sizes=(1, 5)):
+    """Median latency per backend and batch size, plus argmax agreement with ``predict``."""
+    from timing import time_call
+
+    context = model.inputs[0].shape[1]
+    rng = np.random.default_rng(0)
+    probe = rng.integers(0, model.outputs[0].shape[-1], size=(64, context)).astype(np.int32)
+    reference = np.argmax(_first(model.predict(probe, verbose=0)), axis=-1)
+
+    results = {}
+    for name in names or BACKENDS:
+        try:
+            start = time.perf_counter()
+            backend = make_backend(model, name)
+            setup_ms = (time.perf_counter() - start) * 1000
+        except Exception as e:
+            print(f"❌ Backend '{name}' unavailable: {e}")
+            continue
+        results[name] = {
+            "setup_ms": setup_ms,
+            "agreement": float(np.mean(np.argmax(_first(backend(probe)), axis=-1) == reference)),
+        }
+        for batch_size in batch_sizes:
+            windows = probe[:batch_size]
+            results[name][f"batch_{batch_size}_ms"] = time_call(lambda: backend(windows), repeats)
+    return results
+
+
+def _first(outputs):
+    return outputs[0] if isinstance(outputs, list) else outputs
+
+
+def main():
+    from tensorflow.keras.models import load_model
+
+    parser = argparse.ArgumentParser(description="Benchmark inference backends and pick the fastest.")
+    parser.add_argument("--moods", nargs="+", default=["happy", "sad", "calm", "excited", "melancholic"])
+    parser.add_argument("--backends", nargs="+", choices=sorted(BACKENDS))
+    parser.add_argument("--repeats", type=int, default=300)
+    parser.add_argument("--min-agreement", type=float, default=0.99,
+                        help="Backends whose argmax agrees with predict() less often than this are not picked.")
+    args = parser.parse_args()
+
+    report = {}
+    for mood in args.moods:
+        path = f"models/{mood}_chord_model.h5"
+        if not os.path.exists(path):
+            print(f"❌ Model file '{path}' not found.")
+            continue
+        report[mood] = benchmark(load_model(path), args.backends, args.repeats)
+
+        print(f"\nResults for '{mood}':")
+        print(f"{'backend':<10} {'setup ms':>9} {'agree':>7} {'batch 1 ms':>11} {'batch 5 ms':>11}")
+        for name, r in report[mood].items():
+            print(f"{name:<10} {r['setup_ms']:>9.1f} {r['agreement']:>7.2%} "
+                  f"{r['batch_1_ms']:>11.4f} {r['batch_5_ms']:>11.4f}")
+
+    # Pick the backend with the lowest median single-window latency across moods.
+    candidates = {}
+    for results in report.values():
+        for name, r in results.items():
+            if r["agreement"] >= args.min_agreement:
+                candidates.setdefault(name, []).append(r["batch_1_ms"])
+    candidates = {name: timings for name, timings in candidates.items() if len(timings) == len(report)}
+    if not candidates:
+        print("❌ No backend qualified.")
+        return
+
+    choice = min(candidates, key=lambda name: float(np.median(candidates[name])))
+    with open(BACKEND_CHOICE_PATH, "w") as f:
+        json.dump({"backend": choice, "results": report}, f, indent=2)
+    print(f"\n✅ Fastest backend: '{choice}' (saved to '{BACKEND_CHOICE_PATH}')")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import numpy as np
+
+MOODS = ["happy", "sad", "calm", "excited", "melancholic"]
+CHORDS = ["C", "Cm", "D", "Dm", "E", "Em", "F", "Fm", "G", "Gm", "A", "Am", "B", "Bm"]
+# Popular seeds repeat a lot in real traffic; the rest are random.
+POPULAR_SEEDS = [["C", "G", "Am"], ["Am", "F", "C"], ["C", "F", "G"], ["Dm", "G", "C"]]
+
+
+def load_capture(path):
+    """Requests recorded by ``traffic_capture``, oldest first."""
+    requests = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                requests.append({"method": entry["method"], "path": entry["path"],
+                                 "body": entry.get("body"), "ts": entry.get("ts")})
+    requests.sort(key=lambda r: r["ts"] or 0)
+    return requests
+
+
+def synthetic_app_request(rng, popular_share=0.7, engines=("keras",)):
+    seed = rng.choice(POPULAR_SEEDS) if rng.random() < popular_share else rng.sample(CHORDS, 3)
+    body = {"sequence": seed, "steps": rng.choice([4, 8, 16, 32]), "mood": rng.choice(MOODS),
+            "engine": rng.choice(engines)}
+    return {"method": "POST", "path": "/generate-progression", "body": body}
+
+
+def synthetic_game_request(rng):
+    kind = rng.random()
+    if kind < 0.5:
+        return {"method": "POST", "path": "/next-chord", "body": {}}
+    if kind < 0.9:
+        return {"method": "POST", "path": "/play-chord", "body": {"chord": rng.choice(CHORDS)}}
+    return {"method": "POST", "path": "/select-mood", "body": {"mood": rng.choice(MOODS)}}
+
+
+class Client:
+    """HTTP client with one keep-alive connection per thread."""
+
+    def __init__(self, base_url, timeout=30.0):
+        parsed = urlparse(base_url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    def send(self, request):
+        """Return the HTTP status, or 0 if the request failed at the transport level."""
+        body = None if request.get("body") is None else json.dumps(request["body"])
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        try:
+            conn = self._connection()
+            conn.request(request["method"], request["path"], body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            self._local.conn = None
+            return 0
+
+
+def read_rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class RssMonitor(threading.Thread):
+    """Samples the server's resident memory every ``interval`` seconds (Linux ``/proc``)."""
+
+    def __init__(self, pid, interval=1.0):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stopped = threading.Event()
+        self._start_time = time.perf_counter()
+
+    def run(self):
+        while not self._stopped.is_set():
+            rss = read_rss_mb(self.pid)
+            if rss is not None:
+                self.samples.append((round(time.perf_counter() - self._start_time, 2), round(rss, 1)))
+            self._stopped.wait(self.interval)
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def run_closed_loop(client, next_request, concurrency, duration, max_requests):
+    """``concurrency`` workers each send a new request as soon as the last one returns."""
+    results = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    counter = iter(range(max_requests or 10 ** 12))
+
+    def worker():
+        while time.perf_counter() < deadline:
+            with lock:
+                if next(counter, None) is None:
+                    return
+                request = next_request()
+            start = time.perf_counter()
+            status = client.send(request)
+            end = time.perf_counter()
+            with lock:
+                results.append((end, (end - start) * 1000, status))
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def run_open_loop(client, schedule, max_workers):
+    """
+    Send each ``(offset_seconds, request)`` at its scheduled time.
+
+    Latency is measured from the scheduled time, not the actual send, so a
+    server that falls behind shows up as queueing delay instead of being
+    hidden (coordinated omission).
+    """
+    results = []
+    lock = threading.Lock()
+    t0 = time.perf_counter() + 0.05
+
+    def fire(scheduled, request):
+        status = client.send(request)
+        end = time.perf_counter()
+        with lock:
+            results.append((end, (end - scheduled) * 1000, status))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for offset, request in schedule:
+            scheduled = t0 + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(fire, scheduled, request)
+    return results
+
+
+def summarize(results, elapsed, rss_samples):
+    latencies = np.array([latency for _, latency, _ in results]) if results else np.zeros(1)
+    statuses = {}
+    for _, _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    errors = sum(count for status, count in statuses.items() if not status.startswith("2"))
+    start = min((end for end, _, _ in results), default=0)
+    per_second = np.bincount([int(end - start) for end, _, _ in results]).tolist() if results else []
+    return {
+        "requests": len(results),
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(errors / len(results), 4) if results else 0.0,
+        "status_counts": statuses,
+        "latency_ms": {
+            "p50": float(np.percentile(latencies, 50)),
+            "p95": float(np.percentile(latencies, 95)),
+            "p99": float(np.percentile(latencies, 99)),
+            "max": float(latencies.max()),
+        },
+        "completions_per_second": per_second,
+        "rss_mb": rss_samples,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured or synthetic traffic against app.py or game.py.")
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--capture", help="JSONL written by the capture mode (CHORD_CAPTURE_PATH).")
+    parser.add_argument("--target", choices=["app", "game"], default="app", help="Synthetic mix to send.")
+    parser.add_argument("--engines", nargs="+", default=["keras"], help="Engines used by the synthetic app mix.")
+    parser.add_argument("--concurrency", type=int, help="Closed loop with this many concurrent clients.")
+    parser.add_argument("--rate", type=float, help="Open loop at this many requests per second.")
+    parser.add_argument("--preserve-timing", action="store_true",
+                        help="Open loop with the capture's own inter-arrival times (scaled by --speed).")
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--requests", type=int, help="Stop after this many requests.")
+    parser.add_argument("--max-workers", type=int, default=64, help="Thread pool size in open-loop modes.")
+    parser.add_argument("--pid", type=int, help="Server process id to sample RSS from.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the report as JSON.")
+    args = parser.parse_args()
+
+    if sum(bool(mode) for mode in (args.concurrency, args.rate, args.preserve_timing)) != 1:
+        parser.error("Choose exactly one of --concurrency, --rate or --preserve-timing.")
+    if args.preserve_timing and not args.capture:
+        parser.error("--preserve-timing needs --capture.")
+
+    rng = random.Random(args.seed)
+    if args.capture:
+        captured = load_capture(args.capture)
+        if not captured:
+            parser.error(f"No requests in '{args.capture}'.")
+        position = iter(range(10 ** 12))
+        next_request = lambda: captured[next(position) % len(captured)]
+    elif args.target == "app":
+        next_request = lambda: synthetic_app_request(rng, engines=args.engines)
+    else:
+        next_request = lambda: synthetic_game_request(rng)
+
+    client = Client(args.url)
+    monitor = RssMonitor(args.pid) if args.pid else None
+    if monitor:
+        monitor.start()
+
+    start = time.perf_counter()
+    if args.concurrency:
+        results = run_closed_loop(client, next_request, args.concurrency, args.duration, args.requests)
+    else:
+        if args.preserve_timing:
+            ts0 = captured[0]["ts"]
+            schedule = [((r["ts"] - ts0) / args.speed, r) for r in captured]
+        else:
+            count = args.requests or int(args.rate * args.duration)
+            schedule = [(i / args.rate, next_request()) for i in range(count)]
+        if args.requests:
+            schedule = schedule[:args.requests]
+        results = run_open_loop(client, schedule, args.max_workers)
+    elapsed = time.perf_counter() - start
+
+    if monitor:
+        monitor.stop()
+    report = summarize(results, elapsed, monitor.samples if monitor else [])
+
+    latency = report["latency_ms"]
+    print(f"Requests: {report['requests']} in {report['duration_s']:.1f}s "
+          f"({report['throughput_rps']:.1f} req/s), error rate {report['error_rate']:.2%}")
+    print(f"Latency ms: p50 {latency['p50']:.1f}  p95 {latency['p95']:.1f}  "
+          f"p99 {latency['p99']:.1f}  max {latency['max']:.1f}")
+    print(f"Statuses: {report['status_counts']}")
+    if report["rss_mb"]:
+        rss = [mb for _, mb in report["rss_mb"]]
+        print(f"Server RSS MB: start {rss[0]:.1f}  peak {max(rss):.1f}  end {rss[-1]:.1f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Saved report to '{args.output}'")
+
+
+if __name__ == "__main__":
+    main()
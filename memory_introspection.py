@@ -0,0 +1,173 @@
+import gc
+import os
+import sys
+import threading
+import tracemalloc
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Path fragments that identify a third-party subsystem in a traceback.
+SUBSYSTEM_MARKERS = (
+    ("/tensorflow/", "tensorflow"),
+    ("/keras/", "keras"),
+    ("/numpy/", "numpy"),
+    ("/flask/", "flask"),
+    ("/werkzeug/", "flask"),
+    ("/sqlite3/", "sqlite"),
+    ("/midiutil/", "midiutil"),
+)
+
+
+def rss_mb():
+    """
+    Resident set size of this process in MB, from /proc or psutil. Falls
+    back to the peak RSS from ``resource``, and to None where none of these
+    is available.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 2 ** 20
+    if resource is not None:
+        # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+    return None
+
+
+def subsystem(filename):
+    """Which part of the program a source file belongs to: a library, one of our modules, or "other"."""
+    if filename.startswith("<"):
+        return "other"
+    path = filename.replace("\\", "/")
+    for marker, name in SUBSYSTEM_MARKERS:
+        if marker in path:
+            return name
+    if os.path.dirname(os.path.abspath(filename)) == REPO_DIR:
+        return os.path.splitext(os.path.basename(filename))[0]
+    return "other"
+
+
+def array_bytes(obj):
+    """Bytes held by the NumPy arrays (or lists of arrays) stored directly on ``obj``."""
+    total = 0
+    for value in vars(obj).values():
+        for item in value if isinstance(value, list) else [value]:
+            if isinstance(item, np.ndarray):
+                total += item.nbytes
+    return total
+
+
+def keras_weight_bytes(model):
+    return sum(int(np.prod(weight.shape)) * np.dtype(weight.dtype).itemsize for weight in model.weights)
+
+
+def engine_bytes(engine):
+    """Approximate memory held by an engine's parameters (and a TFLite copy, if it has one)."""
+    model = getattr(engine, "model", None)
+    if model is not None:
+        backend_copy = len(getattr(getattr(engine, "backend", None), "model_content", b""))
+        return keras_weight_bytes(model) + backend_copy
+    for attribute in ("ngram", "student", "stream"):
+        inner = getattr(engine, attribute, None)
+        if inner is not None:
+            return array_bytes(inner)
+    return array_bytes(engine)
+
+
+def _location(frame):
+    filename = frame.filename
+    if filename.startswith(REPO_DIR):
+        filename = os.path.relpath(filename, REPO_DIR)
+    return f"{filename}:{frame.lineno}"
+
+
+def _top(diff, limit):
+    return [{"location": _location(stat.traceback[0]), "size_kb": round(stat.size_diff / 1024, 1),
+             "count": stat.count_diff}
+            for stat in diff[:limit]]
+
+
+def by_subsystem(statistics, attribute):
+    totals = {}
+    for stat in statistics:
+        name = subsystem(stat.traceback[0].filename)
+        totals[name] = totals.get(name, 0) + getattr(stat, attribute)
+    return {name: round(size / 1024, 1) for name, size in sorted(totals.items(), key=lambda item: -abs(item[1]))}
+
+
+class SnapshotDiffer:
+    """
+    On-demand ``tracemalloc`` snapshots.
+
+    ``snapshot()`` starts tracing on first use (tracing costs CPU and memory,
+    so it is off until asked for) and afterwards diffs each snapshot against
+    the previous one, grouped by subsystem and by source line.
+    """
+
+    def __init__(self, frames=1):
+        self.frames = frames
+        self._previous = None
+        self._lock = threading.Lock()
+
+    def _take(self):
+        # Collect first so garbage waiting on the cycle collector is not reported as growth.
+        gc.collect()
+        snapshot = tracemalloc.take_snapshot()
+        return snapshot.filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+
+    def snapshot(self, limit=20):
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+                self._previous = self._take()
+                return {"started": True, "frames": self.frames}
+
+            current = self._take()
+            diff = current.compare_to(self._previous, "lineno")
+            self._previous = current
+            return {
+                "started": False,
+                "traced_mb": round(tracemalloc.get_traced_memory()[0] / 2 ** 20, 2),
+                "growth_kb_by_subsystem": by_subsystem(diff, "size_diff"),
+                "top_growth": _top(sorted(diff, key=lambda d: d.size_diff, reverse=True), limit),
+            }
+
+    def stop(self):
+        with self._lock:
+            was_tracing = tracemalloc.is_tracing()
+            tracemalloc.stop()
+            self._previous = None
+            return was_tracing
+
+    def status(self):
+        if not tracemalloc.is_tracing():
+            return {"tracing": False}
+        current, peak = tracemalloc.get_traced_memory()
+        return {"tracing": True, "traced_mb": round(current / 2 ** 20, 2), "peak_mb": round(peak / 2 ** 20, 2)}
+
+
+def cache_tier_bytes(tier):
+    """Local memory or disk held by one result cache tier, where it can be measured."""
+    if hasattr(tier, "nbytes"):
+        return {"entries": len(tier), "bytes": tier.nbytes()}
+    path = getattr(tier, "path", None)
+    if path:
+        size = sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+        return {"disk_bytes": size}
+    return {}
@@ -0,0 +1,247 @@
+import argparse
+import threading
+import time
+from bisect import bisect_left
+
+# Seconds. Spans a table lookup (~10µs) up to a slow cold Keras call.
+DEFAULT_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{value}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with one series per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge:
+    """
+    Value read when the registry is rendered: ``collect()`` returns
+    ``{label values tuple: value}``, so nothing is tracked on hot paths.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames, collect):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def samples(self):
+        for key, value in sorted(self.collect().items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram as Prometheus expects it, plus ``_sum`` and
+    ``_count``. ``observe`` costs one bisect and a few additions under a lock.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        """The series for one label combination; reuse it on hot paths to skip the label lookup."""
+        key = tuple(labels[name] for name in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                # Per-bucket counts (last slot is +Inf), then sum.
+                series = self._series.setdefault(key, [0] * (len(self.buckets) + 1) + [0.0])
+        return _HistogramSeries(self, series)
+
+    def observe(self, value, **labels):
+        self.labels(**labels).observe(value)
+
+    def time(self, **labels):
+        """Context manager observing the wall time of its block."""
+        return _Timer(self.labels(**labels).observe)
+
+    def samples(self):
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(values[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class _HistogramSeries:
+    __slots__ = ("_histogram", "_series")
+
+    def __init__(self, histogram, series):
+        self._histogram = histogram
+        self._series = series
+
+    def observe(self, value):
+        histogram = self._histogram
+        index = bisect_left(histogram.buckets, value)
+        with histogram._lock:
+            self._series[index] += 1
+            self._series[-1] += value
+
+    def time(self):
+        return _Timer(self.observe)
+
+
+class _Timer:
+    __slots__ = ("_observe", "_start")
+
+    def __init__(self, observe):
+        self._observe = observe
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._observe(time.perf_counter() - self._start)
+        return False
+
+
+class Registry:
+    """A set of metrics rendered together in the Prometheus text format (0.0.4)."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name, documentation, labelnames, collect):
+        metric = Gauge(name, documentation, labelnames, collect)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def instrument_app(app, registry, prefix):
+    """
+    Count and time every request of a Flask ``app`` by endpoint and status,
+    and serve ``registry`` at ``/metrics``.
+    """
+    from flask import Response, g, request
+
+    requests_total = registry.counter(f"{prefix}_requests_total", "HTTP requests handled.",
+                                      ("endpoint", "method", "status"))
+    request_seconds = registry.histogram(f"{prefix}_request_seconds", "HTTP request latency in seconds.",
+                                         ("endpoint", "method"))
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop("metrics_start", None)
+        if start is not None:
+            endpoint = request.endpoint or "unmatched"
+            request_seconds.observe(time.perf_counter() - start, endpoint=endpoint, method=request.method)
+            requests_total.inc(endpoint=endpoint, method=request.method, status=str(response.status_code))
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the cost of the metrics primitives.")
+    parser.add_argument("--repeats", type=int, default=200_000)
+    args = parser.parse_args()
+
+    registry = Registry()
+    counter = registry.counter("bench_total", "Benchmark counter.", ("mood",))
+    histogram = registry.histogram("bench_seconds", "Benchmark histogram.", ("stage", "mood"))
+
+    def per_call_ns(fn):
+        start = time.perf_counter()
+        for _ in range(args.repeats):
+            fn()
+        return (time.perf_counter() - start) / args.repeats * 1e9
+
+    def timed_block():
+        with histogram.time(stage="parse", mood="happy"):
+            pass
+
+    series = histogram.labels(stage="inference_step", mood="happy")
+
+    baseline = per_call_ns(lambda: None)
+    print(f"{'operation':<26} {'ns/call':>9}")
+    print(f"{'Counter.inc':<26} {per_call_ns(lambda: counter.inc(mood='happy')) - baseline:>9.0f}")
+    print(f"{'Histogram.observe':<26} "
+          f"{per_call_ns(lambda: histogram.observe(0.001, stage='parse', mood='happy')) - baseline:>9.0f}")
+    print(f"{'Histogram.time':<26} {per_call_ns(timed_block) - baseline:>9.0f}")
+    print(f"{'bound series .observe':<26} {per_call_ns(lambda: series.observe(0.001)) - baseline:>9.0f}")
+    start = time.perf_counter()
+    text = registry.render()
+    print(f"render: {(time.perf_counter() - start) * 1000:.3f} ms for {len(text.splitlines())} lines")
+
+
+if __name__ == "__main__":
+    main()
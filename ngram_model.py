@@ -0,0 +1,129 @@
+import argparse
+import os
+import numpy as np
+
+# Three chords of context, the same window the Keras models see.
+CONTEXT_LENGTH = 3
+
+
+def ngram_path(mood):
+    return f"models/{mood}_ngram.npz"
+
+
+def encode_contexts(windows, vocab_size):
+    """Map each row of ``windows`` (n, k) to a single integer id in base ``vocab_size``."""
+    windows = np.asarray(windows, dtype=np.int64)
+    ids = np.zeros(windows.shape[0], dtype=np.int64)
+    for column in range(windows.shape[1]):
+        ids = ids * vocab_size + windows[:, column]
+    return ids
+
+
+class NGramModel:
+    """
+    Count-based next-chord model with interpolated Witten-Bell smoothing.
+
+    ``counts[n]`` has shape ``(V**n, V)`` and holds how often each chord
+    followed each length-``n`` context. Probabilities for an order-``n``
+    context interpolate its counts with the order ``n - 1`` estimate, and
+    fall back to it entirely for unseen contexts. The full probability and
+    argmax tables for every 3-chord context are precomputed, so a
+    prediction is a single table lookup.
+    """
+
+    def __init__(self, vocabulary, counts):
+        self.vocabulary = list(vocabulary)
+        self.vocab_size = len(self.vocabulary)
+        self.counts = [np.asarray(c, dtype=np.float64) for c in counts]
+        self.context_length = len(self.counts) - 1
+        self.probabilities = self._build_tables()
+        self.best_next = self.probabilities.argmax(axis=1).astype(np.int32)
+
+    @classmethod
+    def fit(cls, windows, targets, vocabulary, weights=None):
+        """Count (context, next chord) pairs for every context length up to the window size."""
+        windows = np.asarray(windows, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        vocab_size = len(vocabulary)
+
+        counts = []
+        for n in range(windows.shape[1] + 1):
+            context_ids = encode_contexts(windows[:, windows.shape[1] - n:], vocab_size)
+            pair_ids = context_ids * vocab_size + targets
+            flat = np.bincount(pair_ids, weights=weights, minlength=vocab_size ** (n + 1))
+            counts.append(flat.reshape(vocab_size ** n, vocab_size))
+        return cls(vocabulary, counts)
+
+    @classmethod
+    def fit_tokens(cls, tokens, vocabulary, context_length=CONTEXT_LENGTH):
+        tokens = np.asarray(tokens, dtype=np.int64)
+        if len(tokens) <= context_length:
+            raise ValueError("Not enough tokens to fit an n-gram model")
+        windows = np.lib.stride_tricks.sliding_window_view(tokens, context_length + 1)
+        return cls.fit(windows[:, :context_length], windows[:, context_length], vocabulary)
+
+    def _build_tables(self):
+        V = self.vocab_size
+        unigram = self.counts[0][0]
+        # Add-one at the bottom so every chord keeps some probability.
+        probabilities = ((unigram + 1) / (unigram.sum() + V))[np.newaxis, :]
+
+        for n in range(1, self.context_length + 1):
+            counts = self.counts[n]
+            totals = counts.sum(axis=1, keepdims=True)
+            distinct = (counts > 0).sum(axis=1, keepdims=True)
+            # The lower-order context drops the oldest chord: id % V**(n-1).
+            lower = probabilities[np.arange(V ** n) % (V ** (n - 1))]
+            denominator = totals + distinct
+            with np.errstate(invalid="ignore", divide="ignore"):
+                interpolated = (counts + distinct * lower) / denominator
+            probabilities = np.where(denominator > 0, interpolated, lower)
+        return probabilities.astype(np.float32)
+
+    def predict_proba(self, windows):
+        windows = np.asarray(windows)[:, -self.context_length:]
+        return self.probabilities[encode_contexts(windows, self.vocab_size)]
+
+    def predict(self, windows):
+        """Most likely next chord index for each row of ``windows``."""
+        windows = np.asarray(windows)[:, -self.context_length:]
+        return self.best_next[encode_contexts(windows, self.vocab_size)]
+
+    def save(self, path):
+        arrays = {f"counts_{n}": c.astype(np.uint32) if np.all(c == np.round(c)) else c.astype(np.float32)
+                  for n, c in enumerate(self.counts)}
+        np.savez_compressed(path, vocabulary=np.array(self.vocabulary), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            vocabulary = [str(v) for v in data["vocabulary"]]
+            n_levels = sum(1 for key in data.files if key.startswith("counts_"))
+            counts = [data[f"counts_{n}"] for n in range(n_levels)]
+        return cls(vocabulary, counts)
+
+
+def main():
+    from dataset_cache import load_cached_dataset
+
+    parser = argparse.ArgumentParser(description="Build the per-mood n-gram models.")
+    parser.add_argument("--dataset", default="datasets/cleaned_chords_with_moods.csv")
+    parser.add_argument("--moods", nargs="+")
+    args = parser.parse_args()
+
+    dataset = load_cached_dataset(args.dataset)
+    os.makedirs("models", exist_ok=True)
+
+    for mood in args.moods or dataset.moods:
+        tokens = dataset.mood_tokens(mood)
+        if len(tokens) <= CONTEXT_LENGTH:
+            print(f"Skipping mood '{mood}' due to insufficient data.")
+            continue
+        model = NGramModel.fit_tokens(tokens, dataset.vocabulary)
+        model.save(ngram_path(mood))
+        print(f"✅ Saved n-gram model for '{mood}' to '{ngram_path(mood)}' "
+              f"({os.path.getsize(ngram_path(mood))} bytes)")
+
+
+if __name__ == "__main__":
+    main()
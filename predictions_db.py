@@ -0,0 +1,46 @@
+import sqlite3
+
+DB_PATH = "predictions.db"
+
+
+def init_db(path=None):
+    conn = sqlite3.connect(path or DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS predictions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        mood TEXT NOT NULL,
+        input_sequence TEXT NOT NULL,
+        generated_progression TEXT NOT NULL,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        engine TEXT
+    )
+    """)
+    # Databases created before the engine column was added.
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(predictions)")}
+    if "engine" not in columns:
+        cursor.execute("ALTER TABLE predictions ADD COLUMN engine TEXT")
+    conn.commit()
+    conn.close()
+
+
+def insert_prediction(mood, sequence, progression, path=None, engine=None):
+    """Store one generated progression and the engine that served it (chord lists are stored comma-joined)."""
+    conn = sqlite3.connect(path or DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO predictions (mood, input_sequence, generated_progression, engine)
+        VALUES (?, ?, ?, ?)
+    """, (mood, ','.join(sequence), ','.join(progression), engine))
+    conn.commit()
+    conn.close()
+
+
+def fetch_predictions(path=None):
+    conn = sqlite3.connect(path or DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, mood, input_sequence, generated_progression, timestamp, engine FROM predictions "
+                   "ORDER BY timestamp DESC")
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
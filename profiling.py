@@ -0,0 +1,151 @@
+import cProfile
+import hmac
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import time
+import uuid
+
+PROFILE_HEADER = "X-Profile"
+REQUEST_ID_HEADER = "X-Request-Id"
+TOP_FUNCTIONS = 15
+
+logger = logging.getLogger(__name__)
+
+
+def top_functions(stats, limit=TOP_FUNCTIONS):
+    """The ``limit`` functions with the highest cumulative time in a ``pstats.Stats``."""
+    rows = []
+    for (filename, line, name), (_, calls, total, cumulative, _) in stats.stats.items():
+        rows.append({
+            "function": f"{os.path.basename(filename)}:{line}({name})" if line else name,
+            "calls": calls,
+            "tottime_ms": round(total * 1000, 3),
+            "cumtime_ms": round(cumulative * 1000, 3),
+        })
+    rows.sort(key=lambda row: row["cumtime_ms"], reverse=True)
+    return rows[:limit]
+
+
+def prune_profiles(directory, max_profiles):
+    """Delete the oldest profiles so at most ``max_profiles`` remain."""
+    summaries = sorted((entry for entry in os.scandir(directory) if entry.name.endswith(".json")),
+                       key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in summaries[max_profiles:]:
+        for path in (entry.path, entry.path[:-len(".json")] + ".prof"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def list_profiles(directory, limit=50):
+    """Summaries of the most recent profiles, newest first."""
+    if not os.path.isdir(directory):
+        return []
+    summaries = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith(".json"):
+            try:
+                with open(entry.path) as f:
+                    summaries.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    summaries.sort(key=lambda summary: summary["started_at"], reverse=True)
+    return summaries[:limit]
+
+
+def install_profiler(app, directory="profiles", sample_rate=0.0, header_enabled=False, max_profiles=100,
+                     admin_token=None):
+    """
+    Profile selected requests of a Flask ``app`` with cProfile.
+
+    A request is profiled when ``header_enabled`` and it carries
+    ``X-Profile: 1`` plus a matching ``X-Admin-Token``, or
+    at random with probability ``sample_rate``. Each profile is written as
+    ``<profile id>.prof`` (pstats) with a ``<profile id>.json`` summary that
+    also records the request id; profile ids are generated here, so callers
+    cannot overwrite each other's profiles. Only the newest ``max_profiles``
+    are kept. ``/admin/profiles`` lists the
+    summaries and ``/admin/profiles/<id>`` downloads a dump. Without an
+    ``admin_token`` both endpoints and the header trigger are refused.
+
+    With profiling disabled no request hooks are installed at all.
+    """
+    from flask import abort, g, jsonify, request, send_file
+
+    def forbidden():
+        return not admin_token or not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), admin_token)
+
+    @app.route('/admin/profiles', methods=['GET'])
+    def profiles():
+        if forbidden():
+            return jsonify({"error": "Forbidden"}), 403
+        return jsonify(list_profiles(directory, int(request.args.get("limit", 50))))
+
+    @app.route('/admin/profiles/<profile_id>', methods=['GET'])
+    def profile_dump(profile_id):
+        if forbidden():
+            return jsonify({"error": "Forbidden"}), 403
+        path = os.path.join(directory, f"{profile_id}.prof")
+        if not re.fullmatch(r"[\w-]+", profile_id) or not os.path.exists(path):
+            abort(404)
+        return send_file(os.path.abspath(path), as_attachment=True)
+
+    if sample_rate <= 0 and not header_enabled:
+        return
+
+    os.makedirs(directory, exist_ok=True)
+
+    @app.before_request
+    def start_profile():
+        requested = header_enabled and request.headers.get(PROFILE_HEADER) == "1" and not forbidden()
+        if not requested and random.random() >= sample_rate:
+            return
+        # Reuse the id from structured_logging.install_request_ids so logs and profiles line up.
+        request_id = g.get("request_id") or request.headers.get(REQUEST_ID_HEADER, "")
+        if not re.fullmatch(r"[\w-]{1,64}", request_id):
+            request_id = uuid.uuid4().hex
+        g.profile = (cProfile.Profile(), uuid.uuid4().hex, request_id, "header" if requested else "sampled",
+                     time.time(), time.perf_counter())
+        g.profile[0].enable()
+
+    @app.after_request
+    def finish_profile(response):
+        state = g.pop("profile", None)
+        if state is None:
+            return response
+        profiler, profile_id, request_id, trigger, started_at, start = state
+        profiler.disable()
+        try:
+            profiler.dump_stats(os.path.join(directory, f"{profile_id}.prof"))
+            stats = pstats.Stats(profiler)
+            summary = {
+                "id": profile_id,
+                "request_id": request_id,
+                "trigger": trigger,
+                "method": request.method,
+                "path": request.path,
+                "endpoint": request.endpoint,
+                "status": response.status_code,
+                "started_at": started_at,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+                "top_functions": top_functions(stats),
+            }
+            with open(os.path.join(directory, f"{profile_id}.json"), "w") as f:
+                json.dump(summary, f, indent=2)
+            prune_profiles(directory, max_profiles)
+            response.headers["X-Profile-Id"] = profile_id
+        except OSError as e:
+            logger.warning("Could not write profile '%s': %s", profile_id, e)
+        return response
+
+    @app.teardown_request
+    def discard_profile(exc):
+        # Only left over when the response never made it through after_request.
+        state = g.pop("profile", None)
+        if state is not None:
+            state[0].disable()
@@ -0,0 +1,123 @@
+import argparse
+import socketserver
+import threading
+import time
+
+
+class RespStore:
+    """In-memory key/value store with per-key expiry, shared by all connections."""
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self.data[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self.lock:
+            self.data[key] = (value, None if ttl is None else time.monotonic() + ttl)
+
+    def delete(self, keys):
+        with self.lock:
+            return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+def _bulk(value):
+    return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    """Serves the RESP commands ``RedisCache`` uses: PING, GET, SET [EX|PX], DEL, SELECT, FLUSHDB, DBSIZE."""
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.split()
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        store = self.server.store
+        while True:
+            try:
+                args = self.read_command()
+            except (OSError, ValueError):
+                return
+            if args is None:
+                return
+            if not args:
+                continue
+            name = args[0].upper()
+            if name == b"PING":
+                reply = b"+PONG\r\n"
+            elif name == b"GET" and len(args) == 2:
+                reply = _bulk(store.get(args[1]))
+            elif name == b"SET" and len(args) in (3, 5):
+                ttl = None
+                if len(args) == 5:
+                    unit = args[3].upper()
+                    if unit not in (b"EX", b"PX"):
+                        self.wfile.write(b"-ERR syntax error\r\n")
+                        continue
+                    ttl = int(args[4]) / (1000 if unit == b"PX" else 1)
+                store.set(args[1], args[2], ttl)
+                reply = b"+OK\r\n"
+            elif name == b"DEL" and len(args) >= 2:
+                reply = b":%d\r\n" % store.delete(args[1:])
+            elif name == b"SELECT":
+                reply = b"+OK\r\n"
+            elif name == b"FLUSHDB":
+                store.clear()
+                reply = b"+OK\r\n"
+            elif name == b"DBSIZE":
+                reply = b":%d\r\n" % len(store.data)
+            else:
+                reply = b"-ERR unknown command '%s'\r\n" % args[0]
+            self.wfile.write(reply)
+
+
+class RespServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, RespHandler)
+        self.store = RespStore()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for Redis, enough for the shared result cache.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+
+    server = RespServer((args.host, args.port))
+    print(f"🚀 RESP stand-in listening on {args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
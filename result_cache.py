@@ -0,0 +1,431 @@
+import hashlib
+import logging
+import os
+import socket
+import sqlite3
+import struct
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire ``ttl`` seconds after
+    they were stored. Holds at most ``maxsize`` entries.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def nbytes(self):
+        """Bytes of the cached values (keys and bookkeeping not included)."""
+        with self._lock:
+            return sum(len(value) for _, value in self._entries.values())
+
+
+class SQLiteCache:
+    """
+    On-disk cache in one SQLite file, shared by every worker process on the host.
+
+    Each thread gets its own connection; WAL mode lets readers and a writer
+    work at the same time. Expired rows and rows beyond ``max_entries`` are
+    pruned every ``prune_every`` writes.
+    """
+
+    def __init__(self, path, max_entries=100_000, prune_every=256):
+        self.path = path
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self._local = threading.local()
+        self._writes = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+        conn.commit()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, default=None):
+        row = self._connection().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())).fetchone()
+        return default if row is None else bytes(row[0])
+
+    def set(self, key, value, ttl=300.0):
+        conn = self._connection()
+        conn.execute("INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                     (key, sqlite3.Binary(value), time.time() + ttl))
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+            conn.execute("""
+                DELETE FROM cache WHERE key IN (
+                    SELECT key FROM cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+        conn.commit()
+
+    def clear(self):
+        conn = self._connection()
+        conn.execute("DELETE FROM cache")
+        conn.commit()
+
+
+class RespError(Exception):
+    """Error reply from a Redis-protocol server."""
+
+
+class RedisCache:
+    """
+    Minimal Redis client speaking RESP over one socket: just GET, SET with
+    an expiry, DEL, PING and FLUSHDB. Works against Redis itself or the
+    stand-in in ``resp_server.py``.
+    """
+
+    def __init__(self, url="redis://localhost:6379/0", timeout=0.5):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._sock = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self._sock.makefile("rb")
+        if self.db:
+            self._send("SELECT", str(self.db))
+
+    def _close(self):
+        if self._sock is not None:
+            try:
+                self._reader.close()
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = self._reader = None
+
+    def _send(self, *args):
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._sock.sendall(b"".join(parts))
+        return self._read_reply()
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RespError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            return [self._read_reply() for _ in range(int(rest))]
+        raise RespError(f"Unexpected reply {line!r}")
+
+    def command(self, *args):
+        """Send one command, reconnecting once if the connection went stale."""
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._send(*args)
+                except (OSError, ConnectionError):
+                    self._close()
+                    if attempt:
+                        raise
+
+    def get(self, key, default=None):
+        value = self.command("GET", key)
+        return default if value is None else value
+
+    def set(self, key, value, ttl=300.0):
+        self.command("SET", key, value, "PX", int(ttl * 1000))
+
+    def delete(self, key):
+        return self.command("DEL", key)
+
+    def ping(self):
+        return self.command("PING") == "PONG"
+
+    def clear(self):
+        self.command("FLUSHDB")
+
+
+class TierStats:
+    """Hit/miss/error counters and lookup latency for one cache tier."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.sets = 0
+        self.lookups = 0
+        self.lookup_ms_total = 0.0
+        self.lookup_ms_max = 0.0
+
+    def record_lookup(self, milliseconds, hit):
+        self.lookups += 1
+        self.lookup_ms_total += milliseconds
+        self.lookup_ms_max = max(self.lookup_ms_max, milliseconds)
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def as_dict(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "sets": self.sets,
+            "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+            "lookup_ms_mean": self.lookup_ms_total / self.lookups if self.lookups else 0.0,
+            "lookup_ms_max": self.lookup_ms_max,
+        }
+
+
+class TieredCache:
+    """
+    Byte-valued cache checked tier by tier (fastest first).
+
+    A hit in a lower tier is copied into the tiers above it. A tier that
+    raises is counted as an error and skipped for ``retry_after`` seconds,
+    so an unreachable Redis never fails or slows down requests.
+    """
+
+    def __init__(self, tiers, ttl=300.0, retry_after=5.0):
+        self.tiers = list(tiers)
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self.stats = {name: TierStats() for name, _ in self.tiers}
+        self._down_until = {name: 0.0 for name, _ in self.tiers}
+
+    def _usable(self, name):
+        return time.monotonic() >= self._down_until[name]
+
+    def _failed(self, name, error):
+        self.stats[name].errors += 1
+        self._down_until[name] = time.monotonic() + self.retry_after
+        logger.warning("Cache tier '%s' failed, skipping it for %.0fs: %s", name, self.retry_after, error)
+
+    def lookup(self, key):
+        """Return ``(value, tier_name)``, or ``(None, None)`` on a miss in every tier."""
+        for position, (name, tier) in enumerate(self.tiers):
+            if not self._usable(name):
+                continue
+            start = time.perf_counter()
+            try:
+                value = tier.get(key)
+            except Exception as e:
+                self._failed(name, e)
+                continue
+            self.stats[name].record_lookup((time.perf_counter() - start) * 1000, value is not None)
+            if value is not None:
+                self._store(key, value, self.tiers[:position])
+                return value, name
+        return None, None
+
+    def get(self, key, default=None):
+        value, _ = self.lookup(key)
+        return default if value is None else value
+
+    def set(self, key, value):
+        self._store(key, value, self.tiers)
+
+    def _store(self, key, value, tiers):
+        for name, tier in tiers:
+            if not self._usable(name):
+                continue
+            try:
+                tier.set(key, value, self.ttl)
+                self.stats[name].sets += 1
+            except Exception as e:
+                self._failed(name, e)
+
+    def stats_dict(self):
+        return {name: stats.as_dict() for name, stats in self.stats.items()}
+
+
+def make_cache(tier_names, ttl=300.0, memory_size=1024, disk_path="cache/results.sqlite",
+               redis_url="redis://localhost:6379/0"):
+    """Build a ``TieredCache`` from names like ``["memory", "disk", "redis"]``."""
+    factories = {
+        "memory": lambda: TTLCache(memory_size, ttl),
+        "disk": lambda: SQLiteCache(disk_path),
+        "redis": lambda: RedisCache(redis_url),
+    }
+    unknown = [name for name in tier_names if name not in factories]
+    if unknown:
+        raise ValueError(f"Unknown cache tiers {unknown}. Choose from {sorted(factories)}.")
+    return TieredCache([(name, factories[name]()) for name in tier_names], ttl)
+
+
+def cache_key(namespace, *parts):
+    """Stable string key shared by every host: ``namespace:<sha1 of parts>``."""
+    return f"{namespace}:{hashlib.sha1(repr(parts).encode()).hexdigest()}"
+
+
+# Generation results: magic, index count, state length, then the chord
+# indices as uint16 and the optional stream state as float32.
+RESULT_HEADER = struct.Struct("<2sHH")
+RESULT_MAGIC = b"P1"
+
+
+def encode_result(indices, state=None):
+    indices = np.asarray(indices, dtype="<u2")
+    state = np.empty(0, dtype="<f4") if state is None else np.asarray(state, dtype="<f4")
+    return RESULT_HEADER.pack(RESULT_MAGIC, len(indices), len(state)) + indices.tobytes() + state.tobytes()
+
+
+def decode_result(payload):
+    """Inverse of ``encode_result``: ``(indices tuple, state array or None)``."""
+    magic, num_indices, state_length = RESULT_HEADER.unpack_from(payload)
+    if magic != RESULT_MAGIC:
+        raise ValueError("Not an encoded generation result")
+    offset = RESULT_HEADER.size
+    indices = np.frombuffer(payload, dtype="<u2", count=num_indices, offset=offset)
+    offset += indices.nbytes
+    state = np.frombuffer(payload, dtype="<f4", count=state_length, offset=offset) if state_length else None
+    return tuple(int(i) for i in indices), state
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls with the same key into one.
+
+    The first caller for a key runs the function; callers arriving while it
+    runs wait and receive its result (or its exception).
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """Return ``(value, shared)``; ``shared`` is True for callers that waited on another."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        try:
+            call.value = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, False
+
+    def __len__(self):
+        """Number of distinct calls currently running."""
+        return len(self._calls)
+
+
+def get_or_compute(cache, flight, key, compute, cacheable=None):
+    """
+    ``compute()`` through the ``TieredCache`` with concurrent misses coalesced by ``flight``.
+
+    Returns ``(value, source)`` where ``source`` is ``"hit-<tier>"``,
+    ``"coalesced"`` or ``"miss"``. Exceptions are passed to every waiter
+    but never cached, and neither are values ``cacheable(value)`` rejects.
+    """
+    value, tier = cache.lookup(key)
+    if value is not None:
+        return value, f"hit-{tier}"
+
+    def compute_and_store():
+        value = compute()
+        if cacheable is None or cacheable(value):
+            cache.set(key, value)
+        return value
+
+    value, shared = flight.do(key, compute_and_store)
+    return value, "coalesced" if shared else "miss"
@@ -0,0 +1,216 @@
+import argparse
+import atexit
+import gc
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+from memory_introspection import by_subsystem, rss_mb
+
+SEED = ["C", "G", "Am"]
+
+
+def make_engine(kind, mood, backend_name):
+    """An engine and its decode function, built the same way app.py builds them."""
+    from engines import (KerasEngine, MultiStepEngine, NGramEngine, StreamEngine, StudentEngine, generate,
+                         generate_multistep, generate_stream)
+
+    if kind in ("keras", "multistep"):
+        from tensorflow.keras.models import load_model
+        from inference_backends import make_backend
+        path = f"models/{mood}_chord_model.h5" if kind == "keras" else f"models/{mood}_multistep_model.h5"
+        model = load_model(path)
+        engine_class = KerasEngine if kind == "keras" else MultiStepEngine
+        decode = generate if kind == "keras" else generate_multistep
+        return engine_class(model, make_backend(model, backend_name)), decode
+    if kind == "ngram":
+        from ngram_model import NGramModel, ngram_path
+        return NGramEngine(NGramModel.load(ngram_path(mood))), generate
+    if kind == "student":
+        from student_model import StudentModel, student_path
+        return StudentEngine(StudentModel.load(student_path(mood))), generate
+    from stream_model import StreamModel, stream_path
+    return StreamEngine(StreamModel.load(stream_path(mood))), lambda engine, seed, steps: generate_stream(
+        engine, seed, steps)[0]
+
+
+def engine_workload(args, rng):
+    """Returns ``run()`` which decodes one random progression and reports how many steps it took."""
+    engine, decode = make_engine(args.engine, args.mood, args.backend)
+    with open(f"mappings/{args.mood}_mappings.json") as f:
+        vocab_size = len(json.load(f)["chord_to_index"])
+
+    def run():
+        steps = rng.randint(1, args.max_steps)
+        decode(engine, [rng.randrange(vocab_size) for _ in range(3)], steps)
+        return steps
+    return run
+
+
+def isolated_workdir():
+    """
+    Switch to a temporary directory that sees the repo's models and mappings,
+    so predictions.db, the MIDI files and the cache the app writes stay out
+    of the repo. Removed again at exit.
+    """
+    repo = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="chord-soak-")
+    for name in ("models", "mappings"):
+        try:
+            os.symlink(os.path.join(repo, name), os.path.join(workdir, name), target_is_directory=True)
+        except OSError:  # e.g. Windows without the symlink privilege
+            shutil.copytree(os.path.join(repo, name), os.path.join(workdir, name))
+    os.chdir(workdir)
+    atexit.register(shutil.rmtree, workdir, ignore_errors=True)
+    return workdir
+
+
+def app_workload(args, rng):
+    """
+    The full ``/generate-progression`` path through the Flask test client
+    (cache, MIDI, SQLite included), run in a throwaway working directory.
+    """
+    workdir = isolated_workdir()
+    import predictions_db
+    predictions_db.DB_PATH = os.path.join(workdir, "predictions.db")
+    import app as chord_app
+
+    chord_app.models_ready.wait()
+    client = chord_app.app.test_client()
+    with open(f"mappings/{args.mood}_mappings.json") as f:
+        chords = list(json.load(f)["chord_to_index"])
+
+    def run():
+        steps = rng.randint(1, args.max_steps)
+        # Mostly new seeds so the result cache keeps filling up, like real traffic.
+        sequence = SEED if rng.random() < 0.3 else rng.sample(chords, 3)
+        response = client.post("/generate-progression", json={
+            "sequence": sequence, "steps": steps, "mood": args.mood, "engine": args.engine})
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        return steps
+    return run
+
+
+def take_sample(steps, calls, started, traced):
+    sample = {"steps": steps, "calls": calls, "elapsed_s": round(time.perf_counter() - started, 2),
+              "rss_mb": round(rss_mb(), 2)}
+    if traced:
+        gc.collect()
+        snapshot = tracemalloc.take_snapshot().filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+        sample["traced_kb"] = by_subsystem(snapshot.statistics("filename"), "size")
+    return sample
+
+
+def growth_per_million(samples, value):
+    """Least-squares slope of ``value(sample)`` against steps, per million steps."""
+    steps = np.array([s["steps"] for s in samples], dtype=np.float64)
+    values = np.array([value(s) for s in samples], dtype=np.float64)
+    if len(samples) < 2 or np.ptp(steps) == 0:
+        return 0.0
+    return float(np.polyfit(steps, values, 1)[0] * 1e6)
+
+
+def analyze(samples, warmup_fraction):
+    """
+    Growth rates over the samples after the warm-up share, so one-off
+    allocations (graph tracing, caches filling) are not mistaken for leaks.
+    """
+    steady = samples[int(len(samples) * warmup_fraction):]
+    report = {
+        "rss_start_mb": samples[0]["rss_mb"],
+        "rss_end_mb": samples[-1]["rss_mb"],
+        "rss_peak_mb": max(s["rss_mb"] for s in samples),
+        "rss_growth_mb_per_million_steps": round(growth_per_million(steady, lambda s: s["rss_mb"]), 3),
+    }
+    if "traced_kb" in samples[0]:
+        names = sorted({name for s in steady for name in s["traced_kb"]})
+        per_subsystem = {name: round(growth_per_million(steady, lambda s: s["traced_kb"].get(name, 0.0)) / 1024, 3)
+                         for name in names}
+        report["traced_growth_mb_per_million_steps"] = dict(
+            sorted(per_subsystem.items(), key=lambda item: -abs(item[1])))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run generation for a long time and watch memory for leaks.")
+    parser.add_argument("--path", choices=["engine", "app"], default="engine",
+                        help="Decode with the engine directly, or through the whole request handler.")
+    parser.add_argument("--engine", choices=["keras", "multistep", "ngram", "student", "stream"], default="keras")
+    parser.add_argument("--backend", default="auto",
+                        help="Keras backend for --path engine (predict, direct, function, xla, tflite, auto).")
+    parser.add_argument("--mood", default="happy")
+    parser.add_argument("--steps", type=int, default=1_000_000, help="Total generation steps to run.")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds even if --steps is not reached.")
+    parser.add_argument("--max-steps", type=int, default=32, help="Progressions are 1..max-steps chords long.")
+    parser.add_argument("--samples", type=int, default=50, help="Memory samples over the run.")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="Also track Python allocations per subsystem (slows the run down noticeably).")
+    parser.add_argument("--warmup-fraction", type=float, default=0.2)
+    parser.add_argument("--max-growth", type=float,
+                        help="Exit 1 if RSS grows faster than this many MB per million steps.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write samples and analysis as JSON.")
+    args = parser.parse_args()
+
+    if rss_mb() is None:
+        raise SystemExit("❌ Cannot read this process's RSS here (no /proc, psutil or resource module).")
+
+    if args.output:
+        args.output = os.path.abspath(args.output)
+    rng = random.Random(args.seed)
+    if args.path == "app":
+        os.environ.setdefault("CHORD_INFERENCE_BACKEND", args.backend)
+        run = app_workload(args, rng)
+    else:
+        run = engine_workload(args, rng)
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    started = time.perf_counter()
+    sample_every = max(1, args.steps // args.samples)
+    samples = [take_sample(0, 0, started, args.tracemalloc)]
+    steps = calls = 0
+    next_sample = sample_every
+    deadline = started + args.duration if args.duration else float("inf")
+
+    print(f"🔁 Soaking {args.path}/{args.engine} ({args.mood}) for {args.steps:,} steps")
+    while steps < args.steps and time.perf_counter() < deadline:
+        steps += run()
+        calls += 1
+        if steps >= next_sample:
+            samples.append(take_sample(steps, calls, started, args.tracemalloc))
+            next_sample += sample_every
+            latest = samples[-1]
+            print(f"  {steps:>12,} steps  {latest['elapsed_s']:>8.1f}s  RSS {latest['rss_mb']:.1f} MB")
+    if samples[-1]["steps"] != steps:
+        samples.append(take_sample(steps, calls, started, args.tracemalloc))
+
+    report = analyze(samples, args.warmup_fraction)
+    elapsed = samples[-1]["elapsed_s"]
+    print(f"Steps: {steps:,} in {calls:,} calls, {elapsed:.1f}s ({steps / max(elapsed, 1e-9):,.0f} steps/s)")
+    print(f"RSS MB: start {report['rss_start_mb']:.1f}  peak {report['rss_peak_mb']:.1f}  "
+          f"end {report['rss_end_mb']:.1f}  steady growth {report['rss_growth_mb_per_million_steps']:+.2f} "
+          f"MB per million steps")
+    for name, growth in list(report.get("traced_growth_mb_per_million_steps", {}).items())[:8]:
+        print(f"  {name:<22} {growth:+.3f} MB per million steps")
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "analysis": report, "samples": samples}, f, indent=2)
+        print(f"✅ Saved report to '{args.output}'")
+
+    if args.max_growth is not None and report["rss_growth_mb_per_million_steps"] > args.max_growth:
+        print(f"⚠️ RSS grows {report['rss_growth_mb_per_million_steps']:.2f} MB per million steps "
+              f"(limit {args.max_growth})")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import argparse
+import os
+import time
+import numpy as np
+
+STREAM_CONFIG = {
+    "embedding_dim": 32,
+    "units": 64,
+    "sequence_length": 16,
+    "stride": 4,
+    "epochs": 60,
+    "batch_size": 32,
+    "learning_rate": 0.003,
+    "test_size": 0.1,
+    "random_state": 42,
+    "early_stopping_patience": 8,
+}
+
+
+def stream_path(mood):
+    return f"models/{mood}_stream.npz"
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+class StreamModel:
+    """
+    Unidirectional GRU evaluated one chord at a time with NumPy.
+
+    The hidden state summarises every chord fed so far, so advancing by one
+    chord is a single cell update. The embedding and input projection are
+    folded into ``input_table`` (one row per chord), leaving one
+    ``units x 3*units`` matrix product per step.
+    """
+
+    def __init__(self, vocabulary, input_table, recurrent_kernel, recurrent_bias, output_kernel, output_bias):
+        self.vocabulary = list(vocabulary)
+        self.input_table = np.asarray(input_table, dtype=np.float32)
+        self.recurrent_kernel = np.asarray(recurrent_kernel, dtype=np.float32)
+        self.recurrent_bias = np.asarray(recurrent_bias, dtype=np.float32)
+        self.output_kernel = np.asarray(output_kernel, dtype=np.float32)
+        self.output_bias = np.asarray(output_bias, dtype=np.float32)
+        self.units = self.recurrent_kernel.shape[0]
+
+    def initial_state(self):
+        return np.zeros(self.units, dtype=np.float32)
+
+    def step(self, state, index):
+        """State after feeding chord ``index`` (Keras GRU, ``reset_after=True``)."""
+        u = self.units
+        x = self.input_table[index]
+        r = state @ self.recurrent_kernel + self.recurrent_bias
+        z = _sigmoid(x[:u] + r[:u])
+        reset = _sigmoid(x[u:2 * u] + r[u:2 * u])
+        candidate = np.tanh(x[2 * u:] + reset * r[2 * u:])
+        return z * state + (1.0 - z) * candidate
+
+    def feed(self, state, indices):
+        for index in indices:
+            state = self.step(state, index)
+        return state
+
+    def next_index(self, state):
+        return int(np.argmax(state @ self.output_kernel + self.output_bias))
+
+    def save(self, path):
+        np.savez(path, vocabulary=np.array(self.vocabulary), input_table=self.input_table,
+                 recurrent_kernel=self.recurrent_kernel, recurrent_bias=self.recurrent_bias,
+                 output_kernel=self.output_kernel, output_bias=self.output_bias)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls([str(v) for v in data["vocabulary"]], data["input_table"], data["recurrent_kernel"],
+                       data["recurrent_bias"], data["output_kernel"], data["output_bias"])
+
+
+def make_sequences(tokens, sequence_length, stride):
+    """Overlapping chunks of ``sequence_length + 1`` tokens for next-chord training."""
+    tokens = np.asarray(tokens, dtype=np.int32)
+    if len(tokens) <= sequence_length:
+        return np.empty((0, sequence_length + 1), dtype=np.int32)
+    windows = np.lib.stride_tricks.sliding_window_view(tokens, sequence_length + 1)
+    return np.array(windows[::stride])
+
+
+def train_stream_model(tokens, vocabulary, config=STREAM_CONFIG):
+    """Train a GRU language model over a mood's token stream and export it."""
+    import tensorflow as tf
+    from sklearn.model_selection import train_test_split
+    from tensorflow.keras.layers import Input, Embedding, GRU, Dense
+
+    vocab_size = len(vocabulary)
+    sequences = make_sequences(tokens, config["sequence_length"], config["stride"])
+    train, test = train_test_split(sequences, test_size=config["test_size"], random_state=config["random_state"])
+
+    inputs = Input(shape=(None,))
+    x = Embedding(vocab_size, config["embedding_dim"])(inputs)
+    x = GRU(config["units"], return_sequences=True)(x)
+    outputs = Dense(vocab_size)(x)
+    model = tf.keras.Model(inputs, outputs)
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=config["learning_rate"]),
+                  loss=tf.keras.losses.SparseCategoricalCrossentropy(from_logits=True),
+                  metrics=['accuracy'])
+    history = model.fit(
+        train[:, :-1], train[:, 1:],
+        validation_data=(test[:, :-1], test[:, 1:]),
+        epochs=config["epochs"],
+        batch_size=config["batch_size"],
+        callbacks=[tf.keras.callbacks.EarlyStopping(monitor='val_loss', restore_best_weights=True,
+                                                    patience=config["early_stopping_patience"])],
+        verbose=0
+    )
+
+    embedding, kernel, recurrent_kernel, bias, output_kernel, output_bias = model.get_weights()
+    stream = StreamModel(vocabulary, embedding @ kernel + bias[0], recurrent_kernel, bias[1],
+                         output_kernel, output_bias)
+    return stream, model, float(max(history.history['val_accuracy']))
+
+
+def main():
+    import train_mood_model as tm
+    from timing import time_call
+
+    parser = argparse.ArgumentParser(description="Train the streaming GRU models.")
+    parser.add_argument("--moods", nargs="+")
+    parser.add_argument("--repeats", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"{'mood':<12} {'val_acc':>8} {'max |Δlogit|':>13} {'ms/step':>9} {'state floats':>13}")
+    for mood in args.moods or tm.chord_data.moods:
+        tokens = tm.chord_data.mood_tokens(mood)
+        start = time.perf_counter()
+        stream, keras_model, val_accuracy = train_stream_model(tokens, tm.all_chords)
+        stream.save(stream_path(mood))
+        print(f"  trained '{mood}' in {time.perf_counter() - start:.1f}s -> '{stream_path(mood)}'")
+
+        # The NumPy cell must reproduce the Keras model step for step.
+        probe = tokens[:32]
+        state, numpy_logits = stream.initial_state(), []
+        for index in probe:
+            state = stream.step(state, index)
+            numpy_logits.append(state @ stream.output_kernel + stream.output_bias)
+        keras_logits = keras_model.predict(probe[np.newaxis, :], verbose=0)[0]
+        drift = float(np.abs(np.array(numpy_logits) - keras_logits).max())
+
+        state = stream.feed(stream.initial_state(), tokens[:3])
+        step_ms = time_call(lambda: stream.step(state, stream.next_index(state)), args.repeats)
+        print(f"{mood:<12} {val_accuracy:>8.4f} {drift:>13.2e} {step_ms:>9.4f} {stream.units:>13}")
+
+
+if __name__ == "__main__":
+    os.makedirs("models", exist_ok=True)
+    main()
@@ -0,0 +1,130 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import uuid
+
+REQUEST_ID_HEADER = "X-Request-Id"
+LOG_LEVEL = os.environ.get("CHORD_LOG_LEVEL", "INFO").upper()
+# "json" (one object per line) or "text".
+LOG_FORMAT = os.environ.get("CHORD_LOG_FORMAT", "json")
+# Share of the high-volume debug lines (logged with ``extra={"sampled": True}``) that are kept.
+DEBUG_SAMPLE_RATE = float(os.environ.get("CHORD_LOG_DEBUG_SAMPLE_RATE", "0.01"))
+
+request_id = contextvars.ContextVar("request_id", default=None)
+log_queue = queue.SimpleQueue()
+_listener = None
+
+# Attributes every LogRecord has; anything else was passed through ``extra``.
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "asctime", "request_id", "sampled", "taskName"}
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps each record with the id of the request being served, if any."""
+
+    def filter(self, record):
+        record.request_id = request_id.get() or "-"
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a ``rate`` share of records marked ``sampled``; all other records pass."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return not getattr(record, "sampled", False) or random.random() < self.rate
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    A ``QueueHandler`` that only merges the message arguments before
+    enqueueing. The stock one also formats the traceback and drops
+    ``exc_info``; here that is left to the listener's formatter.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {"ts": round(record.created, 6), "level": record.levelname, "logger": record.name,
+                 "msg": record.getMessage()}
+        if getattr(record, "request_id", "-") != "-":
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(level=LOG_LEVEL, log_format=LOG_FORMAT, debug_sample_rate=DEBUG_SAMPLE_RATE, stream=None):
+    """
+    Route every logger through a queue to a background listener thread.
+
+    Request threads only filter a record, fill in its message and enqueue
+    it; traceback formatting, JSON encoding and the write to ``stream``
+    (stdout by default) happen on the listener. Calling this again is a no-op.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    if log_format == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+
+    handler = DeferredQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(debug_sample_rate))
+    handler.addFilter(RequestIdFilter())
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
+
+
+def install_request_ids(app):
+    """
+    Give every request of a Flask ``app`` an id: the caller's ``X-Request-Id``
+    if it looks sane, otherwise a new one. It is stamped on log records,
+    kept in ``g.request_id`` and echoed in the response header.
+    """
+    from flask import g, request
+
+    @app.before_request
+    def assign_request_id():
+        incoming = request.headers.get(REQUEST_ID_HEADER, "")
+        g.request_id = incoming if re.fullmatch(r"[\w-]{1,64}", incoming) else uuid.uuid4().hex
+        request_id.set(g.request_id)
+
+    @app.after_request
+    def echo_request_id(response):
+        if "request_id" in g:
+            response.headers[REQUEST_ID_HEADER] = g.request_id
+        return response
+
+    @app.teardown_request
+    def clear_request_id(exc):
+        request_id.set(None)
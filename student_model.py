@@ -0,0 +1,129 @@
+import argparse
+import os
+import time
+import numpy as np
+
+CONTEXT_LENGTH = 3
+
+STUDENT_CONFIG = {
+    "embedding_dim": 16,
+    "hidden_units": 64,
+    "temperature": 2.0,
+    "epochs": 300,
+    "batch_size": 256,
+    "learning_rate": 0.005,
+}
+
+
+def student_path(mood):
+    return f"models/{mood}_student.npz"
+
+
+def all_contexts(vocab_size, context_length=CONTEXT_LENGTH):
+    """Every possible context window, ordered by its base-V id."""
+    grid = np.indices((vocab_size,) * context_length).reshape(context_length, -1).T
+    return grid.astype(np.int32)
+
+
+class StudentModel:
+    """
+    Embedding -> Dense(relu) -> Dense MLP evaluated with plain NumPy.
+
+    Serving needs nothing but the exported arrays: one embedding gather and
+    two small matrix products per batch of windows.
+    """
+
+    def __init__(self, vocabulary, embedding, hidden_kernel, hidden_bias, output_kernel, output_bias):
+        self.vocabulary = list(vocabulary)
+        self.embedding = np.asarray(embedding, dtype=np.float32)
+        self.hidden_kernel = np.asarray(hidden_kernel, dtype=np.float32)
+        self.hidden_bias = np.asarray(hidden_bias, dtype=np.float32)
+        self.output_kernel = np.asarray(output_kernel, dtype=np.float32)
+        self.output_bias = np.asarray(output_bias, dtype=np.float32)
+
+    def logits(self, windows):
+        windows = np.asarray(windows)[:, -CONTEXT_LENGTH:]
+        x = self.embedding[windows].reshape(windows.shape[0], -1)
+        h = np.maximum(x @ self.hidden_kernel + self.hidden_bias, 0)
+        return h @ self.output_kernel + self.output_bias
+
+    def predict(self, windows):
+        return self.logits(windows).argmax(axis=-1)
+
+    def save(self, path):
+        np.savez(path, vocabulary=np.array(self.vocabulary), embedding=self.embedding,
+                 hidden_kernel=self.hidden_kernel, hidden_bias=self.hidden_bias,
+                 output_kernel=self.output_kernel, output_bias=self.output_bias)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls([str(v) for v in data["vocabulary"]], data["embedding"], data["hidden_kernel"],
+                       data["hidden_bias"], data["output_kernel"], data["output_bias"])
+
+
+def distill(teacher, vocabulary, config=STUDENT_CONFIG):
+    """Train a student on the teacher's softened outputs over all contexts."""
+    import tensorflow as tf
+    from tensorflow.keras.layers import Input, Embedding, Flatten, Dense
+
+    vocab_size = len(vocabulary)
+    contexts = all_contexts(vocab_size)
+    teacher_probs = teacher.predict(contexts, batch_size=512, verbose=0)
+
+    # Soften the targets: p ** (1 / T), renormalised.
+    soft = np.power(np.clip(teacher_probs, 1e-8, 1.0), 1.0 / config["temperature"])
+    soft /= soft.sum(axis=1, keepdims=True)
+
+    inputs = Input(shape=(CONTEXT_LENGTH,))
+    x = Embedding(vocab_size, config["embedding_dim"])(inputs)
+    x = Flatten()(x)
+    x = Dense(config["hidden_units"], activation="relu")(x)
+    logits = Dense(vocab_size)(x)
+    student = tf.keras.Model(inputs, logits)
+
+    temperature = config["temperature"]
+    student.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=config["learning_rate"]),
+        loss=lambda y_true, y_pred: tf.keras.losses.categorical_crossentropy(
+            y_true, y_pred / temperature, from_logits=True),
+    )
+    student.fit(contexts, soft, epochs=config["epochs"], batch_size=config["batch_size"], verbose=0)
+
+    embedding, hidden_kernel, hidden_bias, output_kernel, output_bias = student.get_weights()
+    model = StudentModel(vocabulary, embedding, hidden_kernel, hidden_bias, output_kernel, output_bias)
+    agreement = float(np.mean(model.predict(contexts) == teacher_probs.argmax(axis=1)))
+    return model, agreement
+
+
+def main():
+    from tensorflow.keras.models import load_model
+    import train_mood_model as tm
+    from timing import time_call
+
+    parser = argparse.ArgumentParser(description="Distill the mood models into NumPy MLP students.")
+    parser.add_argument("--moods", nargs="+")
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'mood':<12} {'agreement':>10} {'teacher ms':>11} {'student ms':>11} {'bytes':>8}")
+    for mood in args.moods or tm.chord_data.moods:
+        if not os.path.exists(tm.model_path(mood)):
+            print(f"❌ Model file '{tm.model_path(mood)}' not found.")
+            continue
+        teacher = load_model(tm.model_path(mood))
+
+        start = time.perf_counter()
+        student, agreement = distill(teacher, tm.all_chords)
+        student.save(student_path(mood))
+        print(f"  distilled '{mood}' in {time.perf_counter() - start:.1f}s")
+
+        window = np.zeros((1, CONTEXT_LENGTH), dtype=np.int32)
+        teacher_ms = time_call(lambda: teacher(window, training=False), args.repeats)
+        student_ms = time_call(lambda: student.predict(window), args.repeats)
+        print(f"{mood:<12} {agreement:>10.4f} {teacher_ms:>11.4f} {student_ms:>11.4f} "
+              f"{os.path.getsize(student_path(mood)):>8}")
+
+
+if __name__ == "__main__":
+    main()
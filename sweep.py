@@ -0,0 +1,218 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Candidate values for each architecture knob. Everything else comes from
+# train_mood_model.hyperparameters.
+SEARCH_SPACE = {
+    "embedding_dim": [16, 32, 64, 128],
+    "lstm_units": [32, 64, 128, 256],
+    "bidirectional": [False, True],
+    # app.py and the engines feed the model a 3-chord context, so a trial at
+    # any other length could not be deployed.
+    "sequence_length": [3],
+}
+
+SWEEP_DIR = "models/sweep"
+
+
+def sample_trials(num_trials, seed=0):
+    grid = [dict(zip(SEARCH_SPACE, values)) for values in itertools.product(*SEARCH_SPACE.values())]
+    random.Random(seed).shuffle(grid)
+    return grid[:num_trials] if num_trials else grid
+
+
+def _prepare_data(tm, mood, hp):
+    """The same split ``train_mood_model`` trains on, with one-hot targets."""
+    split = tm.split_dataset(mood, hp)
+    if split is None:
+        raise ValueError(f"Not enough data for mood '{mood}'")
+    X_train, X_test, Y_train, Y_test, w_train, w_test = split[:6]
+    return X_train, X_test, tm.one_hot_targets(Y_train), tm.one_hot_targets(Y_test), w_train, w_test
+
+
+def run_trial(spec):
+    """
+    Train one configuration inside a worker process.
+
+    ``spec`` carries the trial id, mood, params, epoch range and, for trials
+    promoted to a later rung, the weights saved by the previous rung.
+    """
+    import tensorflow as tf
+    # Trials run side by side, so keep each one on a single core.
+    tf.config.threading.set_intra_op_parallelism_threads(1)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    import train_mood_model as tm
+
+    hp = dict(tm.hyperparameters, **spec["params"])
+    X_train, X_test, y_train, y_test, w_train, w_test = _prepare_data(tm, spec["mood"], hp)
+
+    model = tm.build_model(hp)
+    if spec.get("weights_path"):
+        model.load_weights(spec["weights_path"])
+
+    callbacks = [
+        tm.LearningRateScheduler(lambda epoch: hp["learning_rate"] * (hp["lr_decay"] ** epoch)),
+        tf.keras.callbacks.EarlyStopping(monitor="val_loss", patience=spec["patience"],
+                                         restore_best_weights=True),
+    ]
+    history = model.fit(
+        X_train, y_train,
+        sample_weight=w_train,
+        validation_data=(X_test, y_test, w_test),
+        initial_epoch=spec["initial_epoch"],
+        epochs=spec["epochs"],
+        batch_size=hp["batch_size"],
+        callbacks=callbacks,
+        verbose=0
+    )
+
+    val_loss, val_accuracy = model.evaluate(X_test, y_test, sample_weight=w_test, verbose=0)
+    weights_path = os.path.join(SWEEP_DIR, spec["mood"], f"trial_{spec['trial_id']}.weights.h5")
+    os.makedirs(os.path.dirname(weights_path), exist_ok=True)
+    model.save_weights(weights_path)
+
+    stopped_early = len(history.epoch) < spec["epochs"] - spec["initial_epoch"]
+    return {
+        "trial_id": spec["trial_id"],
+        "params": spec["params"],
+        "val_loss": float(val_loss),
+        "val_accuracy": float(val_accuracy),
+        "epochs_run": spec["initial_epoch"] + len(history.epoch),
+        "stopped_early": stopped_early,
+        "num_params": int(model.count_params()),
+        "weights_path": weights_path,
+    }
+
+
+def _run_rung(specs, workers):
+    results = []
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = {pool.submit(run_trial, spec): spec for spec in specs}
+        for future in as_completed(futures):
+            spec = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"❌ Trial {spec['trial_id']} failed: {e}")
+                continue
+            print(f"  trial {result['trial_id']:>3} {result['params']} "
+                  f"val_loss={result['val_loss']:.4f} val_acc={result['val_accuracy']:.4f} "
+                  f"epochs={result['epochs_run']}")
+            results.append(result)
+    return results
+
+
+def measure_latency(results, mood, repeats=200):
+    """Median and p90 latency of a single-window forward pass per trial."""
+    import numpy as np
+    import train_mood_model as tm
+
+    for result in results:
+        hp = dict(tm.hyperparameters, **result["params"])
+        model = tm.build_model(hp)
+        model.load_weights(result["weights_path"])
+        x = np.zeros((1, hp["sequence_length"]), dtype=np.int32)
+
+        for _ in range(10):
+            model(x, training=False)
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model(x, training=False)
+            timings.append((time.perf_counter() - start) * 1000)
+        result["latency_ms"] = float(np.median(timings))
+        result["latency_p90_ms"] = float(np.percentile(timings, 90))
+    return results
+
+
+def pareto_front(results):
+    """Trials not beaten on both validation accuracy and latency by another trial."""
+    front = []
+    for r in results:
+        dominated = any(
+            o["val_accuracy"] >= r["val_accuracy"] and o["latency_ms"] <= r["latency_ms"]
+            and (o["val_accuracy"] > r["val_accuracy"] or o["latency_ms"] < r["latency_ms"])
+            for o in results
+        )
+        if not dominated:
+            front.append(r["trial_id"])
+    return front
+
+
+def sweep(mood, num_trials, workers, rung_epochs, max_epochs, keep_fraction, patience, seed):
+    trials = sample_trials(num_trials, seed)
+    print(f"\nSweeping {len(trials)} configurations for mood: {mood}")
+
+    # Rung 1: short runs for every configuration.
+    specs = [{"trial_id": i, "mood": mood, "params": params, "initial_epoch": 0,
+              "epochs": rung_epochs, "patience": patience}
+             for i, params in enumerate(trials)]
+    results = _run_rung(specs, workers)
+
+    # Prune: only the best fraction by validation loss continues.
+    results.sort(key=lambda r: r["val_loss"])
+    num_kept = max(1, int(round(len(results) * keep_fraction)))
+    survivors, pruned = results[:num_kept], results[num_kept:]
+    for r in pruned:
+        r["pruned"] = True
+    print(f"Pruned {len(pruned)} trials, continuing {len(survivors)} up to {max_epochs} epochs")
+
+    # Rung 2: resume the survivors from their rung-1 weights with early stopping.
+    specs = [{"trial_id": r["trial_id"], "mood": mood, "params": r["params"],
+              "initial_epoch": r["epochs_run"], "epochs": max_epochs, "patience": patience,
+              "weights_path": r["weights_path"]}
+             for r in survivors if not r["stopped_early"]]
+    finished = {r["trial_id"]: r for r in survivors}
+    for r in _run_rung(specs, workers):
+        finished[r["trial_id"]] = r
+    for r in finished.values():
+        r["pruned"] = False
+
+    completed = measure_latency(list(finished.values()), mood)
+    front = set(pareto_front(completed))
+    for r in completed:
+        r["pareto"] = r["trial_id"] in front
+
+    ranked = sorted(completed, key=lambda r: (-r["val_accuracy"], r["latency_ms"]))
+    report = {"mood": mood, "search_space": SEARCH_SPACE, "trials": ranked + pruned}
+    report_path = f"models/sweep_{mood}.json"
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\nResults for '{mood}' (* = Pareto point):")
+    print(f"{'':2}{'id':>4} {'emb':>4} {'units':>5} {'bi':>3} {'ctx':>3} {'val_acc':>8} {'ms/call':>8} {'params':>9}")
+    for r in ranked:
+        p = r["params"]
+        print(f"{'*' if r['pareto'] else ' ':2}{r['trial_id']:>4} {p['embedding_dim']:>4} {p['lstm_units']:>5} "
+              f"{'y' if p['bidirectional'] else 'n':>3} {p['sequence_length']:>3} {r['val_accuracy']:>8.4f} "
+              f"{r['latency_ms']:>8.3f} {r['num_params']:>9}")
+    print(f"Saved sweep report to '{report_path}'")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hyperparameter sweep for the mood chord models.")
+    parser.add_argument("--moods", nargs="+", default=["sad"])
+    parser.add_argument("--trials", type=int, default=24, help="Number of sampled configurations (0 = full grid).")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--rung-epochs", type=int, default=5, help="Epochs every trial gets before pruning.")
+    parser.add_argument("--max-epochs", type=int, default=50)
+    parser.add_argument("--keep", type=float, default=0.33, help="Fraction of trials that survive pruning.")
+    parser.add_argument("--patience", type=int, default=5, help="Early-stopping patience on val_loss.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for mood in args.moods:
+        sweep(mood, args.trials, args.workers, args.rung_epochs, args.max_epochs,
+              args.keep, args.patience, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, Rejected
+
+
+def hold_slot(controller, mood, release):
+    """Occupy one slot for ``mood`` on a thread until ``release`` is set; returns once it is held."""
+    admitted = threading.Event()
+
+    def run():
+        with controller.admit(mood, time.perf_counter() + 5):
+            admitted.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert admitted.wait(5)
+    return thread
+
+
+def queue_waiter(controller, mood):
+    """Start a thread that waits in the queue for a slot and releases it right away."""
+    def run():
+        with controller.admit(mood, time.perf_counter() + 5):
+            pass
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    wait_for(lambda: controller.waiting == 1)
+    return thread
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_admits_immediately_when_free():
+    controller = AdmissionController(process_limit=2, mood_limit=2, queue_size=1)
+    with controller.admit("happy", time.perf_counter() + 1):
+        assert controller.stats()["running"] == 1
+    assert controller.stats()["running"] == 0
+
+
+def test_queue_full_is_rejected_with_429_and_retry_after():
+    controller = AdmissionController(process_limit=1, mood_limit=1, queue_size=1)
+    release = threading.Event()
+    holder = hold_slot(controller, "happy", release)
+    waiter = queue_waiter(controller, "happy")
+
+    with pytest.raises(Rejected) as rejected:
+        with controller.admit("sad", time.perf_counter() + 5):
+            pass
+    assert rejected.value.reason == "queue_full"
+    assert rejected.value.status == 429
+    assert rejected.value.retry_after >= 1
+
+    release.set()
+    holder.join(5)
+    waiter.join(5)
+    assert controller.stats()["running"] == 0
+
+
+def test_request_still_queued_at_its_deadline_gets_503():
+    controller = AdmissionController(process_limit=1, mood_limit=1, queue_size=4)
+    release = threading.Event()
+    holder = hold_slot(controller, "happy", release)
+
+    started = time.perf_counter()
+    with pytest.raises(Rejected) as rejected:
+        with controller.admit("happy", started + 0.05):
+            pass
+    assert rejected.value.reason == "deadline_in_queue"
+    assert rejected.value.status == 503
+    assert time.perf_counter() - started < 1
+    assert controller.waiting == 0
+
+    release.set()
+    holder.join(5)
+
+
+def test_waiter_for_a_busy_mood_does_not_block_other_moods():
+    controller = AdmissionController(process_limit=2, mood_limit=1, queue_size=4)
+    release = threading.Event()
+    holder = hold_slot(controller, "happy", release)
+    blocked = queue_waiter(controller, "happy")
+
+    with controller.admit("sad", time.perf_counter() + 1):
+        assert controller.stats()["running_by_mood"]["sad"] == 1
+
+    release.set()
+    holder.join(5)
+    blocked.join(5)
+
+
+def test_admit_if_idle_refuses_instead_of_waiting():
+    controller = AdmissionController(process_limit=1, mood_limit=1, queue_size=4)
+    release = threading.Event()
+    holder = hold_slot(controller, "happy", release)
+
+    with pytest.raises(Rejected) as rejected:
+        with controller.admit_if_idle("happy"):
+            pass
+    assert rejected.value.reason == "busy"
+
+    release.set()
+    holder.join(5)
+    with controller.admit_if_idle("happy"):
+        assert controller.stats()["running"] == 1
@@ -0,0 +1,71 @@
+import time
+
+from engine_router import EngineRouter
+
+FALLBACKS = {"keras": ("table", "ngram")}
+AVAILABLE = {"keras", "table", "ngram"}
+
+
+def make_router(**kwargs):
+    return EngineRouter(slo=0.1, fallbacks=FALLBACKS, unqueued={"table", "ngram"}, **kwargs)
+
+
+def test_unmeasured_engine_is_assumed_fast_enough():
+    router = make_router()
+    assert router.choose("keras", AVAILABLE, steps=100) == ("keras", None)
+
+
+def test_keeps_the_requested_engine_within_the_slo():
+    router = make_router()
+    router.observe("keras", 0.01, 10)
+    engine, expected = router.choose("keras", AVAILABLE, steps=5)
+    assert engine == "keras"
+    assert abs(expected - 0.005) < 1e-9
+
+
+def test_falls_back_to_the_first_fallback_that_meets_the_slo():
+    router = make_router()
+    router.observe("keras", 1.0, 10)
+    router.observe("table", 0.5, 10)
+    router.observe("ngram", 0.001, 10)
+    assert router.choose("keras", AVAILABLE, steps=10)[0] == "ngram"
+
+    router = make_router()
+    router.observe("keras", 1.0, 10)
+    router.observe("table", 0.001, 10)
+    router.observe("ngram", 0.001, 10)
+    assert router.choose("keras", AVAILABLE, steps=10)[0] == "table"
+
+
+def test_uses_the_last_fallback_when_none_meets_the_slo():
+    router = make_router()
+    for engine in ("keras", "table", "ngram"):
+        router.observe(engine, 10.0, 10)
+    assert router.choose("keras", AVAILABLE, steps=10)[0] == "ngram"
+
+
+def test_skips_fallbacks_the_mood_does_not_have():
+    router = make_router()
+    router.observe("keras", 1.0, 10)
+    assert router.choose("keras", {"keras", "ngram"}, steps=10)[0] == "ngram"
+    assert router.choose("keras", {"keras"}, steps=10)[0] == "keras"
+
+
+def test_queue_delay_counts_only_for_queued_engines():
+    router = make_router()
+    router.observe("keras", 0.001, 10)
+    router.observe("table", 0.001, 10)
+    assert router.choose("keras", AVAILABLE, steps=10, queue_delay=0.0)[0] == "keras"
+    assert router.choose("keras", AVAILABLE, steps=10, queue_delay=1.0)[0] == "table"
+
+
+def test_stale_estimate_gets_a_probe_that_replaces_it():
+    router = make_router(probe_after=0.01)
+    router.observe("keras", 1.0, 10)
+    assert router.choose("keras", AVAILABLE, steps=10)[0] == "table"
+    time.sleep(0.02)
+    assert router.choose("keras", AVAILABLE, steps=10)[0] == "keras"
+    # Only one probe at a time; the rest keep falling back until it reports.
+    assert router.choose("keras", AVAILABLE, steps=10)[0] == "table"
+    router.observe("keras", 0.001, 10)
+    assert router.stats()["keras"] == 0.0001
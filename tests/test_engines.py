@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from engines import CONTEXT_LENGTH, TableEngine, generate, generate_speculative
+
+VOCAB_SIZE = 12
+
+
+def random_table_engine(seed):
+    rng = np.random.default_rng(seed)
+    return TableEngine(rng.integers(0, VOCAB_SIZE, VOCAB_SIZE ** CONTEXT_LENGTH), VOCAB_SIZE)
+
+
+def partly_agreeing_drafter(engine, share, seed):
+    """A drafter that picks the engine's chord for roughly ``share`` of the contexts."""
+    rng = np.random.default_rng(seed)
+    table = engine.best_next.copy()
+    differs = rng.random(len(table)) >= share
+    table[differs] = (table[differs] + 1) % VOCAB_SIZE
+    return TableEngine(table, VOCAB_SIZE)
+
+
+@pytest.mark.parametrize("share", [0.0, 0.5, 0.9, 1.0])
+@pytest.mark.parametrize("draft_length", [1, 4, 8])
+def test_speculative_decoding_matches_greedy(share, draft_length):
+    engine = random_table_engine(0)
+    drafter = partly_agreeing_drafter(engine, share, 1)
+    rng = np.random.default_rng(2)
+    for _ in range(20):
+        seed = [int(i) for i in rng.integers(0, VOCAB_SIZE, CONTEXT_LENGTH)]
+        steps = int(rng.integers(1, 40))
+        assert generate_speculative(engine, drafter, seed, steps, draft_length) == generate(engine, seed, steps)
+
+
+def test_a_perfect_drafter_needs_fewer_engine_calls():
+    engine = random_table_engine(0)
+    stats = {}
+    generate_speculative(engine, engine, [1, 2, 3], 32, draft_length=4, stats=stats)
+    assert stats["accepted"] == stats["drafted"]
+    assert stats["engine_calls"] < 32 / 4 + 1
+
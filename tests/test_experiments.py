@@ -0,0 +1,77 @@
+import time
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from admission import AdmissionController
+from engines import CONTEXT_LENGTH, TableEngine, generate
+from experiments import EngineStats, ShadowEvaluator, assign_arm, parse_split
+
+
+def test_parse_split():
+    assert parse_split("") == []
+    assert parse_split("keras=90, student=10") == [("keras", 90.0), ("student", 10.0)]
+    assert parse_split("keras,table") == [("keras", 1.0), ("table", 1.0)]
+    for spec in ("keras=-1", "keras=0", "keras=x"):
+        with pytest.raises(ValueError):
+            parse_split(spec)
+
+
+def test_client_assignment_is_stable():
+    arms = parse_split("keras=50,table=30,ngram=20")
+    for client in ("alice", "10.0.0.7", "c42"):
+        assert len({assign_arm(arms, client) for _ in range(20)}) == 1
+
+
+def test_assignment_follows_the_weights():
+    arms = parse_split("keras=70,table=30")
+    counts = Counter(assign_arm(arms, f"client-{i}") for i in range(10_000))
+    assert abs(counts["keras"] / 10_000 - 0.7) < 0.03
+    assert assign_arm(parse_split("keras=0,table=1"), "anyone") == "table"
+
+
+def wait_for_idle(shadow, timeout=5):
+    deadline = time.monotonic() + timeout
+    while shadow.pending:
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def table_engine(seed, vocab_size=8):
+    rng = np.random.default_rng(seed)
+    return TableEngine(rng.integers(0, vocab_size, vocab_size ** CONTEXT_LENGTH), vocab_size)
+
+
+def test_shadow_agreement_with_the_primary():
+    primary = table_engine(0)
+    bundle = {"engines": {"keras": primary, "table": primary, "ngram": table_engine(1)}}
+    stats = EngineStats()
+    shadow = ShadowEvaluator(["table", "ngram", "student"], stats, workers=1)
+    seed = [1, 2, 3]
+    served = generate(primary, seed, 16)
+
+    shadow.submit("happy", bundle, "keras", seed, served)
+    wait_for_idle(shadow)
+
+    agreement = stats.report()["agreement"]
+    assert agreement["table vs keras"] == {"comparisons": 1, "position_agreement": 1.0, "exact_match": 1.0}
+    assert agreement["ngram vs keras"]["comparisons"] == 1
+    # Engines the mood lacks, and the primary itself, are never shadowed.
+    assert set(agreement) == {"table vs keras", "ngram vs keras"}
+    assert stats.report()["latency"]["table"]["shadow"]["count"] == 1
+
+
+def test_shadow_is_dropped_when_admission_is_busy():
+    engine = table_engine(0)
+    bundle = {"engines": {"keras": engine, "student": engine, "table": engine}}
+    admission = AdmissionController(process_limit=1, mood_limit=1)
+    stats = EngineStats()
+    shadow = ShadowEvaluator(["student", "table"], stats, workers=1, admission=admission, unqueued={"table"})
+
+    with admission.admit("happy", time.perf_counter() + 1):
+        shadow.submit("happy", bundle, "keras", [1, 2, 3], generate(engine, [1, 2, 3], 4))
+        wait_for_idle(shadow)
+
+    assert shadow.dropped == 1
+    assert set(stats.report()["agreement"]) == {"table vs keras"}
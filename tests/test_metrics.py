@@ -0,0 +1,54 @@
+from metrics import Registry
+
+
+def test_counter_renders_help_type_and_one_line_per_series():
+    registry = Registry()
+    counter = registry.counter("chord_requests_total", "Requests served.", ("mood",))
+    counter.inc(mood="sad")
+    counter.inc(mood="happy")
+    counter.inc(2, mood="happy")
+
+    assert registry.render() == (
+        "# HELP chord_requests_total Requests served.\n"
+        "# TYPE chord_requests_total counter\n"
+        'chord_requests_total{mood="happy"} 3\n'
+        'chord_requests_total{mood="sad"} 1\n'
+    )
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    registry.counter("x_total", "X.", ("path",)).inc(path='a"b\\c\nd')
+    assert 'x_total{path="a\\"b\\\\c\\nd"} 1' in registry.render().splitlines()
+
+
+def test_histogram_buckets_are_cumulative_with_sum_and_count():
+    registry = Registry()
+    histogram = registry.histogram("chord_seconds", "Latency.", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, stage="decode")
+
+    assert registry.render().splitlines() == [
+        "# HELP chord_seconds Latency.",
+        "# TYPE chord_seconds histogram",
+        'chord_seconds_bucket{stage="decode",le="0.1"} 1',
+        'chord_seconds_bucket{stage="decode",le="1.0"} 3',
+        'chord_seconds_bucket{stage="decode",le="+Inf"} 4',
+        'chord_seconds_sum{stage="decode"} 6.05',
+        'chord_seconds_count{stage="decode"} 4',
+    ]
+
+
+def test_gauge_reads_its_values_at_render_time():
+    registry = Registry()
+    values = {("happy",): 1}
+    registry.gauge("chord_waiting", "Waiting.", ("mood",), lambda: values)
+    values[("happy",)] = 7
+
+    assert registry.render().splitlines()[-1] == 'chord_waiting{mood="happy"} 7'
+
+
+def test_unlabelled_metric_has_no_braces():
+    registry = Registry()
+    registry.counter("chord_events_total", "Events.").inc()
+    assert registry.render().splitlines()[-1] == "chord_events_total 1"
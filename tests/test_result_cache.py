@@ -0,0 +1,136 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from result_cache import (SingleFlight, TieredCache, TTLCache, decode_result, encode_result,
+                          get_or_compute)
+
+
+class FailingTier:
+    """A cache tier whose backend is unreachable."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, key, default=None):
+        self.calls += 1
+        raise ConnectionError("tier down")
+
+    def set(self, key, value, ttl=None):
+        self.calls += 1
+        raise ConnectionError("tier down")
+
+
+def test_single_flight_runs_one_compute_for_concurrent_callers():
+    flight = SingleFlight()
+    computes = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def compute():
+        computes.append(1)
+        started.set()
+        release.wait(5)
+        return b"value"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("key", compute)))
+    leader.start()
+    assert started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do("key", compute))) for _ in range(7)]
+    for thread in followers:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while flight.coalesced < len(followers):
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+
+    assert len(computes) == 1
+    assert sorted(results) == [(b"value", False)] + [(b"value", True)] * 7
+    assert len(flight) == 0
+
+
+def test_single_flight_passes_the_error_to_every_waiter():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def compute():
+        started.set()
+        release.wait(5)
+        raise RuntimeError("boom")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("key", compute)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    assert started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    while flight.coalesced < 1:
+        time.sleep(0.001)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert errors == ["boom", "boom"]
+
+
+def test_tiered_cache_promotes_lower_tier_hits():
+    upper, lower = TTLCache(16, 60), TTLCache(16, 60)
+    cache = TieredCache([("memory", upper), ("disk", lower)])
+    lower.set("key", b"value")
+
+    assert cache.lookup("key") == (b"value", "disk")
+    assert upper.get("key") == b"value"
+    assert cache.lookup("key") == (b"value", "memory")
+
+
+def test_tiered_cache_skips_a_failed_tier_until_retry_after():
+    down, memory = FailingTier(), TTLCache(16, 60)
+    cache = TieredCache([("redis", down), ("memory", memory)], retry_after=60)
+
+    cache.set("key", b"value")
+    assert memory.get("key") == b"value"
+    assert cache.lookup("key") == (b"value", "memory")
+    assert down.calls == 1
+    assert cache.stats_dict()["redis"]["errors"] == 1
+
+
+def test_get_or_compute_caches_only_accepted_values():
+    cache = TieredCache([("memory", TTLCache(16, 60))])
+    flight = SingleFlight()
+
+    assert get_or_compute(cache, flight, "short", lambda: b"x", lambda value: False) == (b"x", "miss")
+    assert get_or_compute(cache, flight, "short", lambda: b"x", lambda value: False) == (b"x", "miss")
+    assert get_or_compute(cache, flight, "full", lambda: b"y") == (b"y", "miss")
+    assert get_or_compute(cache, flight, "full", lambda: b"z") == (b"y", "hit-memory")
+
+
+@pytest.mark.parametrize("indices, state", [
+    ([], None),
+    ([0, 1, 65535], None),
+    ([3, 1, 4, 1, 5], [0.5, -1.25, 3.0]),
+])
+def test_encode_decode_result_round_trip(indices, state):
+    decoded_indices, decoded_state = decode_result(encode_result(indices, state))
+    assert decoded_indices == tuple(indices)
+    if state is None:
+        assert decoded_state is None
+    else:
+        np.testing.assert_array_equal(decoded_state, np.asarray(state, dtype=np.float32))
+
+
+def test_decode_result_rejects_foreign_payloads():
+    with pytest.raises(ValueError):
+        decode_result(b"XX\x00\x00\x00\x00")
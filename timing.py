@@ -0,0 +1,14 @@
+import time
+import numpy as np
+
+
+def time_call(fn, repeats, warmup=10):
+    """Median wall time of ``fn()`` in milliseconds."""
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
@@ -0,0 +1,91 @@
+import argparse
+import json
+import os
+from collections import defaultdict
+
+DEFAULT_PATH = "traces/spans.jsonl"
+BAR_WIDTH = 40
+
+
+def load_traces(paths):
+    """trace id -> spans, read from the JSONL files written by ``tracing.JsonlExporter``."""
+    traces = defaultdict(list)
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"⚠️ No spans file at '{path}'")
+            continue
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    span = json.loads(line)
+                    traces[span["trace_id"]].append(span)
+    return traces
+
+
+def trace_summary(trace_id, spans):
+    start = min(span["start"] for span in spans)
+    end = max(span["start"] + span["duration_ms"] / 1000 for span in spans)
+    span_ids = {span["span_id"] for span in spans}
+    roots = [span for span in spans if span["parent_id"] not in span_ids]
+    root = min(roots, key=lambda span: span["start"]) if roots else spans[0]
+    return {
+        "trace_id": trace_id,
+        "start": start,
+        "duration_ms": (end - start) * 1000,
+        "root": f"{root['service']}: {root['name']}",
+        "services": sorted({span["service"] for span in spans}),
+        "spans": len(spans),
+        "errors": sum(span["status"] == "error" for span in spans),
+    }
+
+
+def print_tree(spans):
+    """Spans indented under their parents, with a bar showing when each ran within the trace."""
+    trace_start = min(span["start"] for span in spans)
+    trace_ms = max(max(span["start"] + span["duration_ms"] / 1000 for span in spans) - trace_start, 1e-9) * 1000
+    children = defaultdict(list)
+    span_ids = {span["span_id"] for span in spans}
+    for span in sorted(spans, key=lambda span: span["start"]):
+        children[span["parent_id"] if span["parent_id"] in span_ids else None].append(span)
+
+    def walk(parent_id, depth):
+        for span in children[parent_id]:
+            offset = int((span["start"] - trace_start) * 1000 / trace_ms * BAR_WIDTH)
+            width = max(1, int(span["duration_ms"] / trace_ms * BAR_WIDTH))
+            bar = " " * offset + "█" * min(width, BAR_WIDTH - offset)
+            label = f"{'  ' * depth}{span['service']}: {span['name']}"
+            flag = " ❌" if span["status"] == "error" else ""
+            attributes = " ".join(f"{k}={v}" for k, v in span["attributes"].items() if k not in ("kind", "endpoint"))
+            print(f"  {label:<50} {span['duration_ms']:>9.2f} ms |{bar:<{BAR_WIDTH}}| {attributes}{flag}")
+            walk(span["span_id"], depth + 1)
+
+    walk(None, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the slowest traces recorded by tracing.py.")
+    parser.add_argument("paths", nargs="*", default=[DEFAULT_PATH], help="Span files (JSONL).")
+    parser.add_argument("--limit", type=int, default=10, help="How many of the slowest traces to show.")
+    parser.add_argument("--trace", help="Show only this trace id.")
+    parser.add_argument("--service", help="Only traces that include this service.")
+    parser.add_argument("--errors", action="store_true", help="Only traces with a failed span.")
+    args = parser.parse_args()
+
+    traces = load_traces(args.paths)
+    summaries = [trace_summary(trace_id, spans) for trace_id, spans in traces.items()
+                 if not args.trace or trace_id == args.trace]
+    if args.service:
+        summaries = [s for s in summaries if args.service in s["services"]]
+    if args.errors:
+        summaries = [s for s in summaries if s["errors"]]
+    summaries.sort(key=lambda s: s["duration_ms"], reverse=True)
+
+    print(f"{len(summaries)} traces, {sum(s['spans'] for s in summaries)} spans")
+    for summary in summaries[:args.limit]:
+        print(f"\n{summary['trace_id']}  {summary['duration_ms']:.2f} ms  {summary['root']}  "
+              f"({summary['spans']} spans, {', '.join(summary['services'])})")
+        print_tree(traces[summary["trace_id"]])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import atexit
+import contextvars
+import functools
+import json
+import os
+import queue
+import random
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+TRACEPARENT_HEADER = "traceparent"
+TRACE_ID_HEADER = "X-Trace-Id"
+# Scrapes and probes would drown out the traces worth looking at.
+UNTRACED_PREFIXES = ("/metrics", "/ready", "/static")
+_TRACEPARENT = re.compile(r"00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})")
+
+# (trace_id, span_id, sampled) of the span that is currently open in this context.
+_current = contextvars.ContextVar("trace_context", default=None)
+
+
+def parse_traceparent(value):
+    """``(trace_id, span_id, sampled)`` from a W3C ``traceparent`` header, or None if it is malformed."""
+    match = _TRACEPARENT.fullmatch((value or "").strip().lower())
+    if not match or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+
+def format_traceparent(context):
+    trace_id, span_id, sampled = context
+    return f"00-{trace_id}-{span_id}-{'01' if sampled else '00'}"
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start", "_start_perf", "attributes", "status")
+
+    def __init__(self, trace_id, parent_id, name, attributes):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self._start_perf = time.perf_counter()
+        self.attributes = attributes
+        self.status = "ok"
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+
+class JsonlExporter:
+    """
+    Appends finished spans to ``path`` as JSON lines from a background
+    thread, so request threads never wait on the file. Several processes
+    can share one file: each line is written with a single append.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._queue = queue.SimpleQueue()
+        self._flushed = threading.Event()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        threading.Thread(target=self._write_loop, name="trace-exporter", daemon=True).start()
+        atexit.register(self.flush)
+
+    def export(self, record):
+        self._queue.put(record)
+
+    def _write_loop(self):
+        with open(self.path, "a", buffering=1) as f:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    self._flushed.set()
+                    continue
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def flush(self, timeout=2.0):
+        """Wait until every span exported so far has been written."""
+        self._flushed = threading.Event()
+        self._queue.put(None)
+        self._flushed.wait(timeout)
+
+
+class Tracer:
+    """
+    Records spans for one ``service``. Without an exporter every call is a
+    cheap no-op, so instrumented code does not need to check whether tracing
+    is on. New traces are sampled at ``sample_rate``; spans continuing a
+    trace follow the sampling decision of their parent.
+    """
+
+    def __init__(self, service, exporter=None, sample_rate=1.0):
+        self.service = service
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    def start_span(self, name, parent=None, **attributes):
+        """
+        Open a span under ``parent`` (a remote context from
+        ``parse_traceparent``) or else under the current span. Returns
+        ``(span, token)`` for ``end_span``; ``span`` is None when the trace
+        is not sampled.
+        """
+        if self.exporter is None:
+            return None, None
+        parent = parent or _current.get()
+        if parent is None:
+            trace_id, parent_id, sampled = secrets.token_hex(16), None, random.random() < self.sample_rate
+        else:
+            trace_id, parent_id, sampled = parent
+        if not sampled:
+            return None, _current.set((trace_id, parent_id or secrets.token_hex(8), False))
+        span = Span(trace_id, parent_id, name, attributes)
+        return span, _current.set((trace_id, span.span_id, True))
+
+    def end_span(self, span, token, error=None):
+        if token is not None:
+            _current.reset(token)
+        if span is None:
+            return
+        if error is not None:
+            span.status = "error"
+            span.attributes["error"] = f"{type(error).__name__}: {error}"
+        self.exporter.export({
+            "trace_id": span.trace_id,
+            "span_id": span.span_id,
+            "parent_id": span.parent_id,
+            "service": self.service,
+            "name": span.name,
+            "start": round(span.start, 6),
+            "duration_ms": round((time.perf_counter() - span._start_perf) * 1000, 3),
+            "status": span.status,
+            "attributes": span.attributes,
+        })
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Context manager around ``start_span``/``end_span``; yields the span (or None)."""
+        span, token = self.start_span(name, **attributes)
+        try:
+            yield span
+        except BaseException as e:
+            self.end_span(span, token, e)
+            raise
+        self.end_span(span, token)
+
+    def traced(self, name):
+        """Decorator that runs each call of the function in a span called ``name``."""
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def inject(self, headers):
+        """Add a ``traceparent`` header for the current span to ``headers`` and return it."""
+        context = _current.get()
+        if context is not None:
+            headers[TRACEPARENT_HEADER] = format_traceparent(context)
+        return headers
+
+
+def make_tracer(service, path=None, sample_rate=1.0):
+    """A tracer exporting to ``path``, or a disabled one when ``path`` is empty."""
+    return Tracer(service, JsonlExporter(path) if path else None, sample_rate)
+
+
+def install_tracing(app, tracer):
+    """
+    Record a server span for each request of a Flask ``app``, continuing
+    the caller's trace when it sent a ``traceparent`` header. The trace id
+    is returned in ``X-Trace-Id``.
+    """
+    from flask import g, request
+
+    if tracer.exporter is None:
+        return
+
+    @app.before_request
+    def start_request_span():
+        if request.path.startswith(UNTRACED_PREFIXES):
+            return
+        parent = parse_traceparent(request.headers.get(TRACEPARENT_HEADER))
+        g.trace_span = tracer.start_span(f"{request.method} {request.path}", parent,
+                                         endpoint=request.endpoint, kind="server")
+
+    @app.after_request
+    def tag_request_span(response):
+        span = g.get("trace_span", (None, None))[0]
+        if span is not None:
+            span.set("status_code", response.status_code)
+            if response.status_code >= 500:
+                span.status = "error"
+            response.headers[TRACE_ID_HEADER] = span.trace_id
+        return response
+
+    @app.teardown_request
+    def end_request_span(exc):
+        state = g.pop("trace_span", None)
+        if state is not None:
+            tracer.end_span(*state, exc)
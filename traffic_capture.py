@@ -0,0 +1,79 @@
+import atexit
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+SKIPPED_PREFIXES = ("/metrics", "/admin", "/ready", "/static")
+
+
+class TrafficCapture:
+    """
+    Appends one JSON line per request (timestamp, method, path, JSON body,
+    status, duration) for ``load_test.py`` to replay. The file is rotated to
+    ``<path>.1`` once it grows past ``max_bytes``. Encoding and writing
+    happen on a background thread, so request threads only enqueue.
+    """
+
+    def __init__(self, path, sample_rate=1.0, max_bytes=50_000_000):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self._queue = queue.SimpleQueue()
+        self._flushed = threading.Event()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "a", buffering=1)
+        threading.Thread(target=self._write_loop, name="traffic-capture", daemon=True).start()
+        atexit.register(self.flush)
+
+    def record(self, entry):
+        self._queue.put(entry)
+
+    def _write_loop(self):
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                self._flushed.set()
+                continue
+            self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            if self._file.tell() > self.max_bytes:
+                self._file.close()
+                os.replace(self.path, self.path + ".1")
+                self._file = open(self.path, "a", buffering=1)
+
+    def flush(self, timeout=2.0):
+        """Wait until every request recorded so far has been written."""
+        self._flushed = threading.Event()
+        self._queue.put(None)
+        self._flushed.wait(timeout)
+
+
+def install_capture(app, path, sample_rate=1.0):
+    """Capture the requests of a Flask ``app`` to ``path``; admin, metrics and static paths are skipped."""
+    from flask import g, request
+
+    capture = TrafficCapture(path, sample_rate)
+
+    @app.before_request
+    def start_capture():
+        if request.path.startswith(SKIPPED_PREFIXES) or random.random() >= capture.sample_rate:
+            return
+        g.capture_start = (time.time(), time.perf_counter())
+
+    @app.after_request
+    def finish_capture(response):
+        started = g.pop("capture_start", None)
+        if started is not None:
+            capture.record({
+                "ts": round(started[0], 6),
+                "method": request.method,
+                "path": request.full_path.rstrip("?"),
+                "body": request.get_json(silent=True),
+                "status": response.status_code,
+                "duration_ms": round((time.perf_counter() - started[1]) * 1000, 3),
+            })
+        return response
+
+    return capture
@@ -1,5 +1,4 @@
 import os
-import pandas as pd
 import numpy as np
 import tensorflow as tf
 import matplotlib.pyplot as plt
@@ -7,63 +6,91 @@ from tensorflow.keras.models import Model
 from tensorflow.keras.layers import Input, Embedding, LSTM, Dense, Dropout, Bidirectional
 from tensorflow.keras.utils import to_categorical
 from sklearn.model_selection import train_test_split
-from tensorflow.keras.callbacks import LearningRateScheduler
+from tensorflow.keras.callbacks import LearningRateScheduler, EarlyStopping, BackupAndRestore
+import argparse
+import hashlib
 import json
+import shutil
+import time
+from dataset_cache import load_cached_dataset
 
 dataset_path = "datasets/cleaned_chords_with_moods.csv"
 
-def load_chord_dataset(filepath):
-    df = pd.read_csv(filepath)
-    df.columns = df.columns.str.strip().str.lower()
-    required_columns = ["chord sequence", "mood"]
+chord_data = load_cached_dataset(dataset_path)
 
-    if not all(col in df.columns for col in required_columns):
-        raise ValueError(f"Missing required columns. Found: {df.columns}")
+all_chords = chord_data.vocabulary
+chord_to_index = chord_data.chord_to_index
+index_to_chord = chord_data.index_to_chord
+vocab_size = len(all_chords)
 
-    df = df.dropna()
-    df["chord sequence"] = df["chord sequence"].astype(str)
-    return df[["chord sequence", "mood"]]
 
-chord_data = load_chord_dataset(dataset_path)
 
-all_chords = set()
-for progression in chord_data["chord sequence"]:
-    chords = progression.strip().split()
-    all_chords.update(chords)
+sequence_length = 3
 
-all_chords = sorted(all_chords)
-chord_to_index = {chord: i for i, chord in enumerate(all_chords)}
-index_to_chord = {i: chord for chord, i in chord_to_index.items()}
-vocab_size = len(all_chords)
+# Everything that affects the trained weights. Changing any value here changes
+# every mood's fingerprint and triggers a retrain.
+hyperparameters = {
+    "sequence_length": sequence_length,
+    "embedding_dim": 128,
+    "lstm_units": 256,
+    "lstm_dropout": 0.3,
+    "dropout": 0.5,
+    "learning_rate": 0.001,
+    "lr_decay": 0.95,
+    "epochs": 50,
+    "batch_size": 16,
+    "test_size": 0.1,
+    "random_state": 42,
+    "deduplicate": True,
+    "early_stopping_patience": 8,
+}
 
+FINE_TUNE_EPOCHS = 5
 
+def preprocess_data(dataset, target_mood, sequence_length=sequence_length):
+    X, Y = preprocess_multistep(dataset, target_mood, 1, sequence_length)
+    return X, to_categorical(Y[:, 0], num_classes=vocab_size)
 
-sequence_length = 3
 
-def preprocess_data(df, target_mood):
-    mood_sequences = df[df['mood'] == target_mood]['chord sequence'].tolist()
+def preprocess_multistep(dataset, target_mood, horizon, sequence_length=sequence_length):
+    """Context windows and the ``horizon`` chords that follow each, as (n, horizon) indices."""
+    numerical_sequences = dataset.mood_tokens(target_mood)
+
+    if len(numerical_sequences) < sequence_length + horizon:
+        return np.empty((0, sequence_length), dtype=np.int32), np.empty((0, horizon), dtype=np.int32)
+
+    windows = np.lib.stride_tricks.sliding_window_view(numerical_sequences, sequence_length + horizon)
+    return np.array(windows[:, :sequence_length]), np.array(windows[:, sequence_length:])
+
 
-    chord_tokens = []
-    for seq in mood_sequences:
-        chord_tokens += seq.split()
+def deduplicate_rows(X, Y):
+    """
+    Collapse identical (window, targets) rows into unique rows.
 
-    numerical_sequences = [chord_to_index[ch] for ch in chord_tokens if ch in chord_to_index]
+    Returns the unique rows, a sample weight per row proportional to how
+    often it occurred, scaled to a mean of 1, and the raw occurrence counts.
+    With those weights the weighted mean loss over the unique rows equals
+    the mean loss over the original rows.
+    """
+    rows = np.column_stack([X, Y])
+    unique_rows, counts = np.unique(rows, axis=0, return_counts=True)
+    weights = (counts / counts.mean()).astype(np.float32)
+    return unique_rows[:, :X.shape[1]], unique_rows[:, X.shape[1]:], weights, counts
 
-    X, y = [], []
-    for i in range(len(numerical_sequences) - sequence_length):
-        X.append(numerical_sequences[i:i + sequence_length])
-        y.append(numerical_sequences[i + sequence_length])
 
-    return np.array(X), to_categorical(y, num_classes=vocab_size)
+def deduplicate_windows(X, y):
+    """``deduplicate_rows`` for one-hot next-chord targets."""
+    X_unique, targets, weights, _ = deduplicate_rows(X, y.argmax(axis=1))
+    return X_unique, to_categorical(targets[:, 0], num_classes=vocab_size), weights
 
 
 
-def plot_training_results(history, mood):
+def plot_training_results(history, mood, accuracy_key='accuracy', plot_path=None):
     plt.figure(figsize=(14, 5))
 
     plt.subplot(1, 2, 1)
-    plt.plot(history.history['accuracy'], label='Training Accuracy')
-    plt.plot(history.history['val_accuracy'], label='Validation Accuracy')
+    plt.plot(history.history[accuracy_key], label='Training Accuracy')
+    plt.plot(history.history[f'val_{accuracy_key}'], label='Validation Accuracy')
     plt.title(f'{mood.capitalize()} - Model Accuracy')
     plt.xlabel('Epoch')
     plt.ylabel('Accuracy')
@@ -78,57 +105,272 @@ def plot_training_results(history, mood):
     plt.legend()
 
     plt.tight_layout()
-    plt.savefig(f'models/{mood}_training_plot.png')
+    plt.savefig(plot_path or f'models/{mood}_training_plot.png')
     plt.show()
 
 
 
-moods = chord_data["mood"].unique()
-os.makedirs("models", exist_ok=True)
-os.makedirs("mappings", exist_ok=True)
+def model_path(mood, horizon=1):
+    if horizon > 1:
+        return multistep_model_path(mood)
+    return f'models/{mood}_chord_model.h5'
 
-for mood in moods:
-    print(f"\nTraining model for mood: {mood}")
 
-    X, y = preprocess_data(chord_data, mood)
+def multistep_model_path(mood):
+    # One multi-step variant per mood; its horizon is the number of outputs.
+    return f'models/{mood}_multistep_model.h5'
+
+
+def manifest_path(mood, horizon=1):
+    if horizon > 1:
+        return f'models/{mood}_multistep_manifest.json'
+    return f'models/{mood}_manifest.json'
+
+
+def variant_hyperparameters(horizon=1):
+    """Hyperparameters for the next-chord model, or for a ``horizon``-head variant."""
+    if horizon > 1:
+        return dict(hyperparameters, horizon=horizon)
+    return hyperparameters
+
+
+def checkpoint_dir(mood, fingerprint, mode):
+    # Keyed by fingerprint so a checkpoint is only resumed for the same data
+    # and hyperparameters it was written for.
+    return f'models/checkpoints/{mood}-{fingerprint[:12]}-{mode}'
 
-    if X.shape[0] == 0 or y.shape[0] == 0:
-        print(f"Skipping mood '{mood}' due to insufficient data.")
-        continue
 
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.1, random_state=42)
+def mood_fingerprint(dataset, mood, hyperparameters):
+    """Hash of a mood's training tokens, the vocabulary and the hyperparameters."""
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(dataset.mood_tokens(mood), dtype=np.int32).tobytes())
+    digest.update(json.dumps(dataset.vocabulary).encode("utf-8"))
+    digest.update(json.dumps(hyperparameters, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
 
-    chords_input = Input(shape=(sequence_length,))
-    chords_embedding = Embedding(input_dim=vocab_size, output_dim=128)(chords_input)
-    lstm_output = Bidirectional(LSTM(256, dropout=0.3))(chords_embedding)
-    dropout = Dropout(0.5)(lstm_output)
-    output = Dense(vocab_size, activation='softmax')(dropout)
+
+def load_manifest(mood, horizon=1):
+    try:
+        with open(manifest_path(mood, horizon), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_manifest(mood, manifest, horizon=1):
+    tmp_path = f"{manifest_path(mood, horizon)}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path(mood, horizon))
+
+
+def can_fine_tune(manifest, hp=hyperparameters):
+    """A saved model can be warm-started if only the training rows changed."""
+    if manifest is None or not os.path.exists(model_path(manifest["mood"], hp.get("horizon", 1))):
+        return False
+    return (manifest.get("vocabulary") == all_chords
+            and manifest.get("hyperparameters") == hp)
+
+
+def build_model(hp):
+    chords_input = Input(shape=(hp["sequence_length"],))
+    chords_embedding = Embedding(input_dim=vocab_size, output_dim=hp["embedding_dim"])(chords_input)
+    lstm = LSTM(hp["lstm_units"], dropout=hp["lstm_dropout"])
+    if hp.get("bidirectional", True):
+        lstm = Bidirectional(lstm)
+    lstm_output = lstm(chords_embedding)
+    dropout = Dropout(hp["dropout"])(lstm_output)
+    horizon = hp.get("horizon", 1)
+    if horizon > 1:
+        # One softmax head per future position, all reading the same encoding.
+        output = [Dense(vocab_size, activation='softmax', name=f'step_{i + 1}')(dropout)
+                  for i in range(horizon)]
+    else:
+        output = Dense(vocab_size, activation='softmax')(dropout)
 
     model = Model(inputs=chords_input, outputs=output)
-    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=0.001),
-                  loss='categorical_crossentropy',
-                  metrics=['accuracy'])
+    compile_model(model, hp)
+    return model
+
 
-    callbacks = [LearningRateScheduler(lambda epoch: 0.001 * (0.95 ** epoch))]
+def compile_model(model, hp):
+    horizon = hp.get("horizon", 1)
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=hp["learning_rate"]),
+                  loss='categorical_crossentropy',
+                  weighted_metrics=[['accuracy']] * horizon if horizon > 1 else ['accuracy'])
+
+
+def split_dataset(mood, hp):
+    """
+    Deduplicated, weighted train/validation split of one mood's windows.
+
+    Returns ``X_train, X_test, Y_train, Y_test, w_train, w_test, c_train,
+    c_test, num_windows`` with integer targets of shape (n, horizon) and
+    ``c_*`` the raw occurrence count of each row.
+    """
+    X, Y = preprocess_multistep(chord_data, mood, hp.get("horizon", 1), hp["sequence_length"])
+    num_windows = X.shape[0]
+    if num_windows == 0:
+        return None
+
+    if hp["deduplicate"]:
+        X, Y, weights, counts = deduplicate_rows(X, Y)
+        print(f"Deduplicated {num_windows} windows into {X.shape[0]} unique rows "
+              f"({1 - X.shape[0] / num_windows:.0%} duplicates).")
+    else:
+        weights = np.ones(X.shape[0], dtype=np.float32)
+        counts = np.ones(X.shape[0], dtype=np.int64)
+
+    # The split depends only on the row count and seed, so the extra array does not change it.
+    return (*train_test_split(X, Y, weights, counts, test_size=hp["test_size"], random_state=hp["random_state"]),
+            num_windows)
+
+
+def one_hot_targets(Y):
+    """Keras targets for integer targets: one array, or one per head."""
+    if Y.shape[1] == 1:
+        return to_categorical(Y[:, 0], num_classes=vocab_size)
+    return [to_categorical(Y[:, i], num_classes=vocab_size) for i in range(Y.shape[1])]
+
+
+def train_mood(mood, fine_tune=False, fine_tune_epochs=FINE_TUNE_EPOCHS, resume=True, horizon=1):
+    """
+    Train (or warm-start) one mood's model and write its manifest.
+
+    Model and optimizer state are checkpointed after every epoch; an
+    interrupted run picks up from the last completed epoch unless
+    ``resume`` is False. With ``horizon`` > 1 the multi-step variant is
+    trained instead, predicting that many chords per forward pass.
+    """
+    hp = variant_hyperparameters(horizon)
+    fingerprint = mood_fingerprint(chord_data, mood, hp)
+    manifest = load_manifest(mood, horizon)
+
+    split = split_dataset(mood, hp)
+    if split is None:
+        print(f"Skipping mood '{mood}' due to insufficient data.")
+        return None
+
+    X_train, X_test, Y_train, Y_test, w_train, w_test, _, _, num_windows = split
+    y_train, y_test = one_hot_targets(Y_train), one_hot_targets(Y_test)
+    accuracy_key = 'step_1_accuracy' if horizon > 1 else 'accuracy'
+
+    if fine_tune:
+        print(f"\nFine-tuning model for mood: {mood} ({fine_tune_epochs} epochs)")
+        model = tf.keras.models.load_model(model_path(mood, horizon), compile=False)
+        compile_model(model, hp)
+        # Continue the learning-rate decay from where the previous run ended.
+        start_epoch = manifest.get("epochs_trained", hp["epochs"])
+        epochs = fine_tune_epochs
+    else:
+        print(f"\nTraining model for mood: {mood}")
+        model = build_model(hp)
+        start_epoch = 0
+        epochs = hp["epochs"]
+
+    backup_dir = checkpoint_dir(mood, fingerprint, "fine-tune" if fine_tune else "full")
+    if not resume and os.path.exists(backup_dir):
+        shutil.rmtree(backup_dir)
+    elif os.path.exists(backup_dir):
+        print(f"Resuming '{mood}' from checkpoint in '{backup_dir}'")
+
+    early_stopping = EarlyStopping(monitor='val_loss', patience=hp["early_stopping_patience"],
+                                   restore_best_weights=True)
+    callbacks = [
+        LearningRateScheduler(lambda epoch: hp["learning_rate"] * (hp["lr_decay"] ** (start_epoch + epoch))),
+        BackupAndRestore(backup_dir=backup_dir),
+        early_stopping,
+    ]
     history = model.fit(
         X_train, y_train,
-        validation_data=(X_test, y_test),
-        epochs=50,
-        batch_size=16,
+        sample_weight=w_train,
+        validation_data=(X_test, y_test, w_test),
+        epochs=epochs,
+        batch_size=hp["batch_size"],
         callbacks=callbacks,
         verbose=1
     )
 
-    model.save(f'models/{mood}_chord_model.h5')
+    # history.epoch holds absolute epoch numbers, so it also covers resumed runs.
+    epochs_completed = history.epoch[-1] + 1 if history.epoch else 0
+    val_losses = history.history['val_loss']
+    best_epoch = history.epoch[int(np.argmin(val_losses))] if val_losses else epochs_completed - 1
+    stopped_early = epochs_completed < epochs
+
+    model.save(model_path(mood, horizon))
     mappings = {"chord_to_index": chord_to_index, "index_to_chord": index_to_chord}
     with open(f'mappings/{mood}_mappings.json', 'w') as f:
         json.dump(mappings, f)
 
-    plot_training_results(history, mood)
+    manifest = {
+        "mood": mood,
+        "fingerprint": fingerprint,
+        "dataset_key": chord_data.key,
+        "hyperparameters": hp,
+        "vocabulary": all_chords,
+        "num_windows": int(num_windows),
+        "num_unique_windows": int(X_train.shape[0] + X_test.shape[0]),
+        "mode": "fine-tune" if fine_tune else "full",
+        "epochs_trained": start_epoch + epochs_completed,
+        "epochs_saved": start_epoch + best_epoch + 1,
+        "stopped_early": stopped_early,
+        "horizon": horizon,
+        "final_accuracy": float(history.history[accuracy_key][-1]),
+        "final_val_accuracy": float(history.history[f'val_{accuracy_key}'][-1]),
+        "best_val_loss": float(min(val_losses)),
+        "trained_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    save_manifest(mood, manifest, horizon)
+
+    plot_path = f'models/{mood}_multistep_training_plot.png' if horizon > 1 else None
+    plot_training_results(history, mood, accuracy_key, plot_path)
 
     print(f"\nResults for '{mood}':")
-    print(f"Final Training Accuracy: {history.history['accuracy'][-1]:.4f}")
-    print(f"Final Validation Accuracy: {history.history['val_accuracy'][-1]:.4f}")
-
-print("\n Training completed!")
-
+    print(f"Final Training Accuracy: {history.history[accuracy_key][-1]:.4f}")
+    print(f"Final Validation Accuracy: {history.history[f'val_{accuracy_key}'][-1]:.4f}")
+    if stopped_early:
+        print(f"Stopped early after {epochs_completed} epochs, kept weights from epoch {best_epoch + 1}.")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train one chord model per mood.")
+    parser.add_argument("--moods", nargs="+", help="Only consider these moods (default: all in the dataset).")
+    parser.add_argument("--force", action="store_true",
+                        help="Retrain even if the data and hyperparameters are unchanged.")
+    parser.add_argument("--fine-tune", action="store_true",
+                        help="Warm-start changed moods from their existing weights instead of training from scratch.")
+    parser.add_argument("--fine-tune-epochs", type=int, default=FINE_TUNE_EPOCHS)
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Discard checkpoints from an interrupted run and start over.")
+    parser.add_argument("--multistep", type=int, default=1, metavar="K",
+                        help="Train the variant that predicts the next K chords at once.")
+    args = parser.parse_args()
+    horizon = args.multistep
+    hp = variant_hyperparameters(horizon)
+
+    os.makedirs("models", exist_ok=True)
+    os.makedirs("mappings", exist_ok=True)
+
+    moods = args.moods or chord_data.moods
+    for mood in moods:
+        manifest = load_manifest(mood, horizon)
+        fingerprint = mood_fingerprint(chord_data, mood, hp)
+        up_to_date = (manifest is not None and manifest.get("fingerprint") == fingerprint
+                      and os.path.exists(model_path(mood, horizon)))
+
+        if up_to_date and not args.force:
+            print(f"✅ Model for '{mood}' is up to date, skipping.")
+            continue
+
+        fine_tune = args.fine_tune and not args.force and can_fine_tune(manifest, hp)
+        if args.fine_tune and not args.force and not fine_tune:
+            print(f"⚠️ Cannot warm-start '{mood}', training from scratch.")
+        train_mood(mood, fine_tune=fine_tune, fine_tune_epochs=args.fine_tune_epochs,
+                   resume=not args.no_resume, horizon=horizon)
+
+    print("\n Training completed!")
+
+
+if __name__ == "__main__":
+    main()